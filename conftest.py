@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def inline_workers(settings):
+    """Миниатюры и подсказки считаются сразу, без фоновых пулов.
+
+    Фоновый поток пережил бы очистку тестовой базы и временный
+    MEDIA_ROOT.
+    """
+    settings.THUMBNAIL_WORKERS = 0
+    settings.SUGGESTION_WORKERS = 0
+
+
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    """Чтение только из основной базы, как в ``core.runner``.
+
+    Реплика в тестах — зеркало основной базы и не видит данных
+    незакоммиченного теста.
+    """
+    settings.READ_REPLICA_ENABLED = False
@@ -0,0 +1,3 @@
+API_PAGE_SIZE = 10
+API_MAX_PAGE_SIZE = 100
+API_CHUNK_SIZE = 100
@@ -0,0 +1,51 @@
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+}
+
+GROUP_FIELDS = {
+    'id': lambda group: group.pk,
+    'title': lambda group: group.title,
+    'slug': lambda group: group.slug,
+    'description': lambda group: group.description,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'text': lambda comment: comment.text,
+    'author': lambda comment: comment.author.username,
+    'created': lambda comment: comment.created,
+}
+
+PROFILE_FIELDS = {
+    'username': lambda user: user.username,
+    'full_name': lambda user: user.get_full_name(),
+    'posts_count': lambda user: user.profile.posts_count,
+    'followers_count': lambda user: user.profile.followers_count,
+    'following_count': lambda user: user.profile.following_count,
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def select_fields(request, fields):
+    """Разбирает параметр ``fields=`` — список нужных полей через запятую."""
+    requested = request.GET.get('fields')
+    if not requested:
+        return fields
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise InvalidFields(', '.join(unknown))
+    return {name: fields[name] for name in names}
+
+
+def serialize(obj, fields):
+    return {name: getter(obj) for name, getter in fields.items()}
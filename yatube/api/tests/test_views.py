@@ -0,0 +1,96 @@
+import json
+from http import HTTPStatus
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+def read(response):
+    """Собирает потоковый или обычный ответ и разбирает JSON."""
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.user, group=cls.group)
+            for number in range(5)
+        ]
+        Post.objects.create(text='Без группы', author=cls.user)
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_post_list_streams_pages_by_cursor(self):
+        """Список постов отдаётся потоком и листается курсором"""
+        url = reverse('api:post_list')
+        response = self.client.get(url, {'group': 'group', 'limit': 3})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        first = read(response)
+        self.assertEqual(len(first['results']), 3)
+        self.assertIsNotNone(first['next'])
+
+        second = read(self.client.get(
+            url, {'group': 'group', 'limit': 3, 'cursor': first['next']}))
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(
+            ids, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fields(self):
+        """Параметр fields оставляет в ответе только нужные поля"""
+        data = read(self.client.get(
+            reverse('api:post_list'), {'fields': 'id,author'}))
+        self.assertEqual(
+            set(data['results'][0]), {'id', 'author'})
+
+    def test_unknown_field_is_bad_request(self):
+        """Неизвестное поле в fields даёт ответ 400"""
+        response = self.client.get(
+            reverse('api:post_list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', read(response)['detail'])
+
+    def test_detail_endpoints(self):
+        """Поля отдельных объектов и вложенных списков"""
+        post = self.posts[0]
+        data = read(self.client.get(
+            reverse('api:post_detail', args=(post.pk,))))
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['comments_count'], 1)
+
+        data = read(self.client.get(
+            reverse('api:profile_detail', args=(self.user.username,))))
+        self.assertEqual(data['posts_count'], 6)
+
+        data = read(self.client.get(
+            reverse('api:comment_list', args=(post.pk,))))
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+
+        data = read(self.client.get(reverse('api:group_list')))
+        self.assertEqual(data['results'][0]['slug'], 'group')
+
+    def test_missing_object_is_json_404(self):
+        """Несуществующий объект — ответ 404 в JSON"""
+        response = self.client.get(reverse('api:post_detail', args=(0,)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', read(response))
+
+    def test_read_only(self):
+        """API только для чтения: POST не разрешён"""
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
@@ -0,0 +1,117 @@
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from posts.constants import COMMENT_ORDERING, CURSOR_ORDERING
+from posts.models import Comment, Group, Post, User
+from posts.utils import CursorPaginator
+
+from .constants import API_CHUNK_SIZE, API_MAX_PAGE_SIZE, API_PAGE_SIZE
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, PROFILE_FIELDS,
+    InvalidFields, select_fields, serialize)
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def api_view(view):
+    """Только чтение, ошибки — в JSON."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено'}, status=404)
+        except InvalidFields as error:
+            return JsonResponse(
+                {'detail': f'Неизвестные поля: {error}'}, status=400)
+    return wrapper
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        size = API_PAGE_SIZE
+    return max(1, min(size, API_MAX_PAGE_SIZE))
+
+
+def stream_page(request, queryset, fields, ordering):
+    """Отдаёт страницу по курсору, сериализуя записи по одной.
+
+    Выборка обходится через ``iterator()``, а ответ пишется потоком,
+    поэтому память не растёт вместе с размером страницы. Курсор
+    следующей страницы известен только в конце и идёт последним полем.
+    """
+    fields = select_fields(request, fields)
+    paginator = CursorPaginator(queryset, page_size(request), ordering)
+    rows = paginator.seek(request.GET.get('cursor'))
+
+    def generate():
+        yield '{"results": ['
+        last = next_cursor = None
+        for index, obj in enumerate(rows.iterator(chunk_size=API_CHUNK_SIZE)):
+            if index == paginator.per_page:
+                next_cursor = paginator.encode_cursor('next', last)
+                break
+            if index:
+                yield ','
+            yield dumps(serialize(obj, fields))
+            last = obj
+        yield f'], "next": {dumps(next_cursor)}}}'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
+
+@api_view
+def post_list(request):
+    posts = Post.objects.for_feed()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+
+    return stream_page(request, posts, POST_FIELDS, CURSOR_ORDERING)
+
+
+@api_view
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+
+    return JsonResponse(
+        serialize(post, select_fields(request, POST_FIELDS)),
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@api_view
+def comment_list(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+
+    return stream_page(request, comments, COMMENT_FIELDS, COMMENT_ORDERING)
+
+
+@api_view
+def group_list(request):
+    return stream_page(
+        request, Group.objects.all(), GROUP_FIELDS, ('pk',))
+
+
+@api_view
+def profile_detail(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+
+    return JsonResponse(
+        serialize(author, select_fields(request, PROFILE_FIELDS)),
+        json_dumps_params={'ensure_ascii': False},
+    )
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import apply_pragmas, check_connections
+
+        connection_created.connect(apply_pragmas)
+        request_started.connect(check_connections)
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class BackgroundPool:
+    """Фоновый пул потоков с отсевом повторных задач.
+
+    Число потоков берётся из настройки ``setting`` при каждом вызове;
+    при 0 задача выполняется сразу в вызывающем потоке. Ключи задач,
+    которые уже ждут выполнения, :meth:`claim` отбрасывает, а
+    :meth:`release` снимает, когда задача больше не ждёт.
+    """
+
+    def __init__(self, setting, name):
+        self.setting = setting
+        self.name = name
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, self.setting),
+                    thread_name_prefix=self.name,
+                )
+            return self._executor
+
+    def claim(self, keys):
+        """Отмечает ключи как ждущие; возвращает те, что ещё не ждали."""
+        with self._lock:
+            fresh = set(keys) - self._pending
+            self._pending.update(fresh)
+        return fresh
+
+    def release(self, keys):
+        with self._lock:
+            self._pending.difference_update(keys)
+
+    def run(self, func, *args):
+        """Выполняет ``func(*args)`` в пуле или сразу, если потоков нет."""
+        if not getattr(settings, self.setting):
+            func(*args)
+            return
+        self._get_executor().submit(self._run_in_pool, func, *args)
+
+    @staticmethod
+    def _run_in_pool(func, *args):
+        try:
+            func(*args)
+        finally:
+            close_old_connections()
@@ -0,0 +1,38 @@
+import sqlite3
+
+from django.conf import settings
+from django.db import connections
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Настраивает новое соединение SQLite прагмами из ``SQLITE_PRAGMAS``.
+
+    Режим журнала хранится в самом файле базы, поэтому меняется только
+    с пишущего соединения; реплика открывается на чтение.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(settings.SQLITE_PRAGMAS)
+    if connection.alias == settings.READ_REPLICA_ALIAS:
+        pragmas.pop('journal_mode', None)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def check_connections(**kwargs):
+    """Закрывает сохранённые соединения, которые перестали отвечать.
+
+    Проверка идёт мимо обёрток Django, чтобы не попадать в журнал
+    запросов и счётчики тестов.
+    """
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if connection.vendor == 'sqlite':
+            try:
+                connection.connection.execute('SELECT 1')
+            except sqlite3.Error:
+                connection.close()
+        elif not connection.is_usable():
+            connection.close()
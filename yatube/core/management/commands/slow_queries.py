@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slowlog import read_entries, worst_offenders
+
+
+class Command(BaseCommand):
+    help = 'Худшие формы запросов из журнала медленных запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--path', default=settings.SLOW_QUERY_LOG_FILE)
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Показать план самого медленного запроса каждой формы')
+
+    def handle(self, *args, **options):
+        offenders = worst_offenders(
+            read_entries(options['path']), options['top'])
+        if not offenders:
+            self.stdout.write('Медленных запросов нет')
+            return
+        for item in offenders:
+            self.stdout.write(self.style.WARNING(
+                f'{item["fingerprint"]}: {item["count"]} раз, '
+                f'всего {item["total_ms"]:.1f} мс, '
+                f'максимум {item["max_ms"]:.1f} мс, '
+                f'представления: {", ".join(sorted(item["views"])) or "—"}'
+            ))
+            self.stdout.write(f'  {item["shape"]}')
+            if options['plans'] and item['plan']:
+                for row in item['plan']:
+                    self.stdout.write(f'    {row}')
@@ -0,0 +1,96 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import routing, slowlog, timing
+
+
+class ServerTimingMiddleware:
+    """Разбивает время запроса по фазам и копит гистограммы задержек.
+
+    Разбивка по SQL, шаблонам, кэшу и миниатюрам уходит в заголовок
+    ``Server-Timing``, а полное время — в гистограмму представления.
+    Фазы могут вкладываться друг в друга: кэш и миниатюры обычно
+    вызываются во время отрисовки шаблона.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        timing.instrument_templates()
+
+    def __call__(self, request):
+        timer = timing.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        total = time.perf_counter() - started
+        response['Server-Timing'] = timer.header(total)
+        match = request.resolver_match
+        timing.latencies.observe(
+            match.view_name if match else 'unresolved', total * 1000)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Пишет медленные запросы к базе в журнал вместе с их планом.
+
+    Включается настройкой ``SLOW_QUERY_THRESHOLD_MS``.
+    """
+
+    def __init__(self, get_response):
+        if not slowlog.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        def source():
+            match = request.resolver_match
+            return {
+                'view': match.view_name if match else None,
+                'path': request.get_full_path(),
+            }
+
+        with slowlog.slow_query_logging(source):
+            return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение из реплики безопасным запросам к ленте.
+
+    Это GET и HEAD к представлениям из ``READ_REPLICA_VIEWS``. Запрос,
+    который что-то записал, ставит куку: следующие
+    ``READ_REPLICA_PIN_SECONDS`` секунд запросы этого клиента читают
+    из основной базы и видят собственные изменения.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routing.begin(replica=False)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routing.end()
+        if wrote:
+            response.set_cookie(
+                settings.READ_REPLICA_PIN_COOKIE, '1',
+                max_age=settings.READ_REPLICA_PIN_SECONDS, httponly=True)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        routing.begin(replica=(
+            request.method in ('GET', 'HEAD')
+            and match.view_name in settings.READ_REPLICA_VIEWS
+            and settings.READ_REPLICA_PIN_COOKIE not in request.COOKIES
+        ))
@@ -0,0 +1,66 @@
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+
+def begin(replica):
+    """Начало запроса: можно ли читать из реплики."""
+    _state.replica = replica
+    _state.wrote = False
+
+
+def end():
+    wrote = getattr(_state, 'wrote', False)
+    _state.replica = _state.wrote = False
+    return wrote
+
+
+def replica_alias():
+    """Псевдоним реплики или основной базы, если реплика отключена.
+
+    В тестах реплику отключает ``READ_REPLICA_ENABLED``: там она —
+    зеркало основной базы и не видит данных незакоммиченного теста.
+    """
+    if not settings.READ_REPLICA_ENABLED:
+        return DEFAULT_DB_ALIAS
+    return settings.READ_REPLICA_ALIAS
+
+
+def reads_from_replica():
+    """Читать из реплики, если запрос разрешил и ещё ничего не писал.
+
+    Внутри транзакции на основной базе чтение остаётся на ней: там
+    могут быть незакоммиченные изменения, которых реплика не видит.
+    """
+    return (
+        getattr(_state, 'replica', False)
+        and not getattr(_state, 'wrote', False)
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class PrimaryReplicaRouter:
+    """Запись — в основную базу, чтение страниц ленты — из реплики.
+
+    Из реплики читаются только модели из ``READ_REPLICA_MODELS``:
+    сессии, ленты подписок и прочее — всегда из основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (reads_from_replica()
+                and model._meta.label_lower in settings.READ_REPLICA_MODELS):
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,19 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class PrimaryOnlyRunner(DiscoverRunner):
+    """Запуск тестов, в котором всё читается из основной базы.
+
+    Реплика в тестах — зеркало основной базы (``TEST['MIRROR']``);
+    второе соединение к ней не видело бы данных незакоммиченного теста.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._primary_only = override_settings(READ_REPLICA_ENABLED=False)
+        self._primary_only.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._primary_only.disable()
+        super().teardown_test_environment(**kwargs)
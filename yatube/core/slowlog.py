@@ -0,0 +1,177 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger('yatube.slow_queries')
+
+_handler_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Форма запроса: литералы и параметры заменены на ``?``.
+
+    Списки ``IN (?, ?, ...)`` любой длины сворачиваются в ``(?+)``,
+    чтобы один и тот же запрос с разным числом id считался одним.
+    """
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _LIST.sub('(?+)', shape)
+    shape = _SPACE.sub(' ', shape).strip()
+    return shape, hashlib.md5(shape.encode()).hexdigest()[:12]
+
+
+def enabled():
+    return settings.SLOW_QUERY_THRESHOLD_MS is not None
+
+
+def _ensure_handler():
+    if logger.handlers:
+        return
+    with _handler_lock:
+        if logger.handlers:
+            return
+        path = settings.SLOW_QUERY_LOG_FILE
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def explain(connection, sql, params):
+    """План запроса; выполняется мимо обёрток, чтобы не попасть в замеры."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.cursor.execute(f'{prefix} {sql}', params)
+            return [
+                ' '.join(str(column) for column in row)
+                for row in cursor.cursor.fetchall()
+            ]
+    except Exception as error:
+        return [f'EXPLAIN не удался: {error}']
+
+
+class SlowQueryWrapper:
+    """Обёртка ``execute_wrapper``, пишущая медленные запросы в журнал."""
+
+    def __init__(self, connection, source=None):
+        self.connection = connection
+        self.source = source or (lambda: {})
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= self.threshold:
+            self.log(sql, params, many, duration)
+        return result
+
+    def log(self, sql, params, many, duration):
+        shape, digest = fingerprint(sql)
+        if many:
+            params, plan = None, None
+        else:
+            plan = explain(self.connection, sql, params)
+            params = [str(param) for param in params or ()]
+        entry = {
+            'time': timezone.now().isoformat(),
+            'database': self.connection.alias,
+            'duration_ms': round(duration, 3),
+            'fingerprint': digest,
+            'shape': shape,
+            'sql': sql,
+            'params': params,
+            'plan': plan,
+            **self.source(),
+        }
+        _ensure_handler()
+        logger.info(json.dumps(entry, ensure_ascii=False))
+
+
+@contextmanager
+def slow_query_logging(source=None):
+    """Журналирует медленные запросы на всех соединениях внутри блока.
+
+    ``source`` возвращает словарь с контекстом вызова — например,
+    представление и адрес, — он дописывается к каждой записи.
+    """
+    if not enabled():
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(
+                SlowQueryWrapper(connection, source)))
+        yield
+
+
+def read_entries(path):
+    """Записи журнала вместе с ротированными копиями, от старых к новым."""
+    rotated = {}
+    for name in glob.glob(f'{glob.escape(path)}.*'):
+        suffix = name.rsplit('.', 1)[1]
+        if suffix.isdigit():
+            rotated[int(suffix)] = name
+    paths = [rotated[number] for number in sorted(rotated, reverse=True)]
+    for name in [*paths, path]:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as source:
+            for line in source:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def worst_offenders(entries, top=10):
+    """Сводка по формам запросов, худшие — по суммарному времени."""
+    summary = {}
+    for entry in entries:
+        item = summary.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'shape': entry['shape'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'views': set(),
+            'plan': None,
+        })
+        item['count'] += 1
+        item['total_ms'] += entry['duration_ms']
+        if entry.get('view'):
+            item['views'].add(entry['view'])
+        if entry['duration_ms'] >= item['max_ms']:
+            item['max_ms'] = entry['duration_ms']
+            item['plan'] = entry.get('plan')
+    return sorted(
+        summary.values(), key=lambda item: item['total_ms'], reverse=True
+    )[:top]
@@ -0,0 +1,32 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core.background import BackgroundPool
+
+
+@override_settings(TEST_WORKERS=0)
+class BackgroundPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = BackgroundPool('TEST_WORKERS', 'test')
+
+    def test_claim_skips_pending_keys(self):
+        """Ждущие ключи повторно не выдаются, пока их не снимут"""
+        self.assertEqual(self.pool.claim([1, 2]), {1, 2})
+        self.assertEqual(self.pool.claim([2, 3]), {3})
+        self.pool.release([2])
+        self.assertEqual(self.pool.claim([2]), {2})
+
+    def test_runs_inline_without_workers(self):
+        """Без потоков задача выполняется сразу"""
+        func = mock.Mock()
+        self.pool.run(func, 'a', 1)
+        func.assert_called_once_with('a', 1)
+
+    @override_settings(TEST_WORKERS=1)
+    def test_runs_in_thread_with_workers(self):
+        """С потоками задача уходит в пул"""
+        func = mock.Mock()
+        self.pool.run(func, 'a')
+        self.pool._executor.shutdown(wait=True)
+        func.assert_called_once_with('a')
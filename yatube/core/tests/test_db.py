@@ -0,0 +1,31 @@
+import sqlite3
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from core import db
+
+
+class SqliteProfileTest(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        """Новое соединение получает прагмы из настроек"""
+        with connection.cursor() as cursor:
+            for name in ('cache_size', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(
+                    cursor.fetchone()[0], settings.SQLITE_PRAGMAS[name])
+
+    def test_health_check_closes_broken_connection(self):
+        """Неотвечающее сохранённое соединение закрывается"""
+        broken = mock.Mock(vendor='sqlite', in_atomic_block=False)
+        broken.connection.execute.side_effect = sqlite3.OperationalError
+        healthy = mock.Mock(vendor='sqlite', in_atomic_block=False)
+        closed = mock.Mock(connection=None)
+        with mock.patch.object(db, 'connections') as connections:
+            connections.all.return_value = [broken, healthy, closed]
+            db.check_connections()
+        broken.close.assert_called_once_with()
+        healthy.close.assert_not_called()
+        closed.close.assert_not_called()
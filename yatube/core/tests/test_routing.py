@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import routing
+from posts.models import Post, Timeline, User
+
+
+class PrimaryReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = routing.PrimaryReplicaRouter()
+        self.addCleanup(routing.end)
+        replica = mock.patch.object(
+            routing, 'replica_alias', return_value='replica')
+        replica.start()
+        self.addCleanup(replica.stop)
+        outside_transaction = mock.patch.object(
+            connections[DEFAULT_DB_ALIAS], 'in_atomic_block', False)
+        outside_transaction.start()
+        self.addCleanup(outside_transaction.stop)
+
+    def test_reads_go_to_replica_until_first_write(self):
+        """После записи чтение в том же запросе идёт в основную базу"""
+        routing.begin(replica=True)
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        self.assertEqual(self.router.db_for_write(Post), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_only_listed_models_read_from_replica(self):
+        """Сессии и ленты подписок читаются из основной базы"""
+        routing.begin(replica=True)
+        for model in (Session, Timeline, User):
+            with self.subTest(model=model):
+                self.assertEqual(
+                    self.router.db_for_read(model), DEFAULT_DB_ALIAS)
+
+    def test_reads_stay_on_primary_when_not_allowed(self):
+        """Без разрешения запроса чтение идёт в основную базу"""
+        routing.begin(replica=False)
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_migrations_only_on_primary(self):
+        """Миграции применяются только к основной базе"""
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+class ReplicaRoutingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='router')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_test_mirror_reads_from_primary(self):
+        """В тестах реплика отключена, чтение идёт из основной базы"""
+        self.assertEqual(routing.replica_alias(), DEFAULT_DB_ALIAS)
+        with self.settings(READ_REPLICA_ENABLED=True):
+            self.assertEqual(
+                routing.replica_alias(), settings.READ_REPLICA_ALIAS)
+
+    def test_write_pins_client_to_primary(self):
+        """Запрос с записью ставит куку чтения из основной базы"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(settings.READ_REPLICA_PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'})
+        cookie = response.cookies[settings.READ_REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.READ_REPLICA_PIN_SECONDS)
+
+
+class ReplicaReadsTest(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='replica-reader')
+        self.post = Post.objects.create(text='С реплики', author=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+        replica = mock.patch.object(
+            routing, 'replica_alias', return_value='replica')
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def test_page_reads_posts_from_replica(self):
+        """Страница читает посты из реплики, а сессию — из основной базы"""
+        replica = CaptureQueriesContext(connections['replica'])
+        primary = CaptureQueriesContext(connections[DEFAULT_DB_ALIAS])
+        with replica, primary:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        replica_sql = ' '.join(query['sql'] for query in replica)
+        primary_sql = ' '.join(query['sql'] for query in primary)
+        self.assertIn('"posts_post"', replica_sql)
+        self.assertNotIn('django_session', replica_sql)
+        self.assertIn('django_session', primary_sql)
+
+    def test_follow_feed_reads_from_primary(self):
+        """Лента подписок не читается из реплики"""
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(replica), 0)
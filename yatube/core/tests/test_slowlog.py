@@ -0,0 +1,61 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import slowlog
+from posts.models import Post, User
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='slow')
+        Post.objects.create(text='Пост', author=author)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'slow.log')
+        self.addCleanup(self.close_handlers)
+
+    def close_handlers(self):
+        for handler in slowlog.logger.handlers[:]:
+            handler.close()
+            slowlog.logger.removeHandler(handler)
+
+    def test_fingerprint_ignores_literals_and_list_length(self):
+        """Отпечаток запроса не зависит от литералов и длины списка IN"""
+        first, digest = slowlog.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'")
+        second, other = slowlog.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'b'")
+        self.assertEqual(
+            first, 'SELECT * FROM t WHERE id IN (?+) AND name = ?')
+        self.assertEqual(digest, other)
+
+    def test_slow_queries_logged_with_view_and_plan(self):
+        """Запросы дольше порога попадают в журнал с планом и параметрами"""
+        with override_settings(
+                SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG_FILE=self.path):
+            Client().get(reverse('posts:profile', args=('slow',)))
+        entries = list(slowlog.read_entries(self.path))
+        self.assertTrue(entries)
+        select = next(
+            entry for entry in entries if entry['sql'].startswith('SELECT'))
+        self.assertEqual(select['view'], 'posts:profile')
+        self.assertIsNotNone(select['plan'])
+        self.assertIn('slow', select['params'])
+
+        out = StringIO()
+        call_command('slow_queries', f'--path={self.path}', stdout=out)
+        self.assertIn('posts:profile', out.getvalue())
+
+    def test_disabled_by_default(self):
+        """Без порога журнал медленных запросов не пишется"""
+        with override_settings(SLOW_QUERY_LOG_FILE=self.path):
+            Client().get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.timing import Histogram, latencies
+from posts.models import Group, Post, User
+
+
+class ServerTimingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='timed')
+        group = Group.objects.create(
+            title='Группа', slug='timed', description='Описание')
+        Post.objects.create(text='Пост', author=cls.user, group=group)
+
+    def setUp(self):
+        cache.clear()
+        latencies.clear()
+        self.client = Client()
+
+    def phases(self, response):
+        return {
+            part.split(';')[0]: part
+            for part in response['Server-Timing'].split(', ')
+        }
+
+    def test_header_breaks_down_request(self):
+        """Заголовок Server-Timing разбивает время по фазам"""
+        response = self.client.get(
+            reverse('posts:group_list', args=('timed',)))
+        phases = self.phases(response)
+        for name in ('sql', 'template', 'cache', 'total'):
+            self.assertIn(name, phases)
+        self.assertIn('desc="2"', phases['sql'])
+
+    def test_latency_histogram_per_view(self):
+        """Задержки копятся в гистограмме своего представления"""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.client.get('/missing/')
+        stats = latencies.snapshot()
+        self.assertEqual(stats['posts:index']['count'], 3)
+        self.assertEqual(stats['unresolved']['count'], 1)
+
+    def test_stats_are_staff_only(self):
+        """Статистика задержек доступна только персоналу"""
+        url = reverse('latency_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.assertIn('latency_stats', self.client.get(url).json())
+
+
+class HistogramTest(TestCase):
+    def test_percentiles_use_bucket_bounds(self):
+        """Перцентили округляются до верхних границ корзин"""
+        histogram = Histogram(bounds=(10, 100))
+        for value in (1, 2, 3, 50, 500):
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(50), 10)
+        self.assertEqual(histogram.percentile(80), 100)
+        self.assertEqual(histogram.percentile(99), float('inf'))
@@ -0,0 +1,197 @@
+import bisect
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.template.base import Template
+
+HISTOGRAM_BOUNDS_MS = (
+    5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Суммарное время и число вызовов по фазам одного запроса."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._depth = defaultdict(int)
+
+    def header(self, total):
+        """Значение заголовка ``Server-Timing``, времена в миллисекундах."""
+        parts = [
+            f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]}"'
+            for name, seconds in sorted(self.durations.items())
+        ]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def start():
+    _local.timer = RequestTimer()
+    return _local.timer
+
+
+def stop():
+    _local.timer = None
+
+
+@contextmanager
+def phase(name):
+    """Засчитывает время блока в фазу ``name`` текущего запроса.
+
+    Вне запроса (например, в фоновых потоках) ничего не делает.
+    Вложенные блоки одной фазы — шаблон внутри шаблона, ``get_many``
+    через ``get`` — считаются один раз, по внешнему.
+    """
+    timer = getattr(_local, 'timer', None)
+    if timer is None or timer._depth[name]:
+        yield
+        return
+    timer._depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.durations[name] += time.perf_counter() - started
+        timer.counts[name] += 1
+        timer._depth[name] -= 1
+
+
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Обёртка для ``connection.execute_wrapper``: фаза ``sql``."""
+    with phase('sql'):
+        return execute(sql, params, many, context)
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными границами корзин."""
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def percentile(self, share):
+        """Верхняя граница корзины, в которую попадает перцентиль."""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = share / 100 * self.count
+            seen = 0
+            for bound, count in zip(self.bounds, self.buckets):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            count, total = self.count, self.total
+            buckets = dict(zip(
+                [*map(str, self.bounds), 'inf'], self.buckets))
+        return {
+            'count': count,
+            'mean_ms': round(total / count, 3) if count else None,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'buckets': buckets,
+        }
+
+
+class LatencyRegistry:
+    """Гистограммы задержек по именам представлений в памяти процесса."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view_name, value):
+        histogram = self._histograms.get(view_name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    view_name, Histogram())
+        histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {
+            name: histogram.snapshot()
+            for name, histogram in sorted(histograms.items())
+        }
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+latencies = LatencyRegistry()
+
+
+class EventCounter:
+    """Счётчики событий (попадания в кэш и т.п.) в памяти процесса."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(sorted(self._counts.items()))
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+events = EventCounter()
+
+
+class TimedLocMemCache(LocMemCache):
+    """``LocMemCache``, чьи обращения попадают в фазу ``cache``."""
+
+    get = timed('cache')(LocMemCache.get)
+    get_many = timed('cache')(LocMemCache.get_many)
+    set = timed('cache')(LocMemCache.set)
+    add = timed('cache')(LocMemCache.add)
+    incr = timed('cache')(LocMemCache.incr)
+    delete = timed('cache')(LocMemCache.delete)
+    touch = timed('cache')(LocMemCache.touch)
+
+
+def instrument_templates():
+    """Засчитывает отрисовку шаблонов Django в фазу ``template``."""
+    if getattr(Template.render, 'timed', False):
+        return
+    Template.render = timed('template')(Template.render)
+    Template.render.timed = True
@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .timing import events, latencies
+
 
 def page_not_found(request, exception):
 
@@ -14,3 +18,15 @@ def csrf_failure(request, reason=''):
 def internal_server_error(request):
 
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def latency_stats(request):
+
+    return JsonResponse(latencies.snapshot())
+
+
+@staff_member_required
+def event_stats(request):
+
+    return JsonResponse(events.snapshot())
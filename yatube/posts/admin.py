@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Comment, Post, Group, Follow
+from . import counters
+from .search import filter_matching, match_expression
+from .models import Comment, Post, Group, Follow, Profile
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,8 +12,26 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if match_expression(search_term) is None:
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'posts_count', 'followers_count', 'following_count')
+    search_fields = ('user__username',)
+    actions = ('reconcile_counters',)
+
+    def reconcile_counters(self, request, queryset):
+        fixed = counters.reconcile()
+        self.message_user(request, f'Исправлено счётчиков: {fixed}')
+    reconcile_counters.short_description = 'Пересчитать все счётчики'
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
 admin.site.register(Follow)
+admin.site.register(Profile, ProfileAdmin)
@@ -0,0 +1,80 @@
+import re
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client
+
+from core.slowlog import explain, fingerprint
+
+_FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING| VIRTUAL)')
+_TEMP_SORT = re.compile(r'\bUSE TEMP B-TREE FOR ([\w ]+)')
+
+
+class QueryRecorder:
+    """Обёртка ``execute_wrapper``, запоминающая запросы и их параметры."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.queries.append((self.connection, sql, params))
+        return execute(sql, params, many, context)
+
+
+def capture(url, user=None):
+    """Запросы, которые делает страница при холодном кэше."""
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    cache.clear()
+    recorders = [QueryRecorder(connection) for connection in connections.all()]
+    with ExitStack() as stack:
+        for recorder in recorders:
+            stack.enter_context(
+                recorder.connection.execute_wrapper(recorder))
+        response = client.get(url)
+    if response.status_code != 200:
+        raise ValueError(f'{url}: ответ {response.status_code}')
+    return [query for recorder in recorders for query in recorder.queries]
+
+
+def problems(plan):
+    """Полные просмотры таблиц и сортировки во временном B-дереве."""
+    found = []
+    for line in plan:
+        for table in _FULL_SCAN.findall(line):
+            if table not in ('CONSTANT', 'SUBQUERY'):
+                found.append(f'полный просмотр {table}')
+        for clause in _TEMP_SORT.findall(line):
+            found.append(f'временная сортировка для {clause}')
+    return found
+
+
+def advise(targets):
+    """Планы уникальных запросов каждой страницы с найденными проблемами.
+
+    ``targets`` — словарь ``имя: (адрес, пользователь)``, как у
+    :func:`posts.benchmark.targets`. Одинаковые по форме запросы
+    одной страницы проверяются один раз.
+    """
+    report = {}
+    for name, (url, user) in targets.items():
+        seen = set()
+        report[name] = []
+        for connection, sql, params in capture(url, user):
+            shape, digest = fingerprint(sql)
+            if digest in seen:
+                continue
+            seen.add(digest)
+            plan = explain(connection, sql, params)
+            if plan is None:
+                continue
+            report[name].append({
+                'shape': shape,
+                'plan': plan,
+                'problems': problems(plan),
+            })
+    return report
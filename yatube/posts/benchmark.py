@@ -0,0 +1,246 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment)
+from django.urls import reverse
+
+from .constants import (
+    BENCHMARK_CALIBRATION_LOOP, BENCHMARK_NOISE_MS, BENCHMARK_PERCENTILES)
+from .generator import DatasetGenerator
+from .models import Group, Post, User
+
+VIEWS = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+
+
+def targets():
+    """Адреса замеряемых страниц для самых тяжёлых объектов набора.
+
+    Берутся самая населённая группа, самый плодовитый автор, самый
+    обсуждаемый пост и самый активный подписчик — на них страницы
+    медленнее всего.
+    """
+    group = Group.objects.annotate(
+        total=Count('posts')).order_by('-total', 'pk').first()
+    author = User.objects.order_by('-profile__posts_count', 'pk').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    reader = User.objects.annotate(
+        total=Count('follower')).order_by('-total', 'pk').first()
+    if not (group and author and post and reader):
+        raise ValueError('В базе не хватает данных для замеров')
+    return {
+        'index': (reverse('posts:index'), None),
+        'group_list': (
+            reverse('posts:group_list', args=(group.slug,)), None),
+        'profile': (
+            reverse('posts:profile', args=(author.username,)), None),
+        'post_detail': (
+            reverse('posts:post_detail', args=(post.pk,)), None),
+        'follow_index': (reverse('posts:follow_index'), reader),
+    }
+
+
+@contextmanager
+def seeded_database(users, groups, posts, comments, follows_per_user,
+                    seed=0):
+    """Временная база с воспроизводимым набором данных.
+
+    Реплика смотрит в ту же временную базу, но, как и в тестах, чтение
+    идёт из основной. После выхода из блока база удаляется, а настройки
+    соединений возвращаются.
+    """
+    setup_test_environment()
+    primary_only = override_settings(READ_REPLICA_ENABLED=False)
+    primary_only.enable()
+    old_name = connection.settings_dict['NAME']
+    replica = connections[settings.READ_REPLICA_ALIAS]
+    old_replica_name = replica.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    replica.creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        DatasetGenerator(seed=seed).generate(
+            users=users,
+            groups=groups,
+            posts=posts,
+            comments=comments,
+            follows_per_user=follows_per_user,
+        )
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        replica.settings_dict['NAME'] = old_replica_name
+        primary_only.disable()
+        teardown_test_environment()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = round(share / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def summarize(times, sql_times, queries):
+    result = {
+        f'p{share}_ms': round(percentile(times, share) * 1000, 3)
+        for share in BENCHMARK_PERCENTILES
+    }
+    result['sql_ms'] = round(statistics.median(sql_times) * 1000, 3)
+    result['queries'] = max(queries)
+    return result
+
+
+class QueryTimer:
+    """Обёртка ``execute_wrapper``: число запросов и их время.
+
+    Время меряется ``perf_counter`` вокруг каждого запроса: в
+    ``captured_queries`` оно округлено до миллисекунды.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def measure(url, user=None, iterations=30, warmup=3, cold=True):
+    """Замеряет страницу через тестовый клиент.
+
+    При ``cold=True`` кэш очищается перед каждым запросом, так что
+    замеряется сама выборка и отрисовка, а не попадание в кэш.
+    """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    times, sql_times, queries = [], [], []
+    for number in range(warmup + iterations):
+        if cold:
+            cache.clear()
+        timer = QueryTimer()
+        with ExitStack() as stack:
+            for database in connections.all():
+                stack.enter_context(database.execute_wrapper(timer))
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise ValueError(f'{url}: ответ {response.status_code}')
+        if number < warmup:
+            continue
+        times.append(elapsed)
+        sql_times.append(timer.seconds)
+        queries.append(timer.count)
+    return summarize(times, sql_times, queries)
+
+
+def run(iterations=30, warmup=3, cold=True, views=VIEWS):
+    return {
+        name: measure(url, user, iterations, warmup, cold)
+        for name, (url, user) in targets().items() if name in views
+    }
+
+
+def throughput(paths, duration=5.0, threads=4):
+    """Запросов в секунду через полный WSGI-обработчик в ``threads`` потоках.
+
+    В отличие от тестового клиента обработчик шлёт ``request_started``
+    и ``request_finished``, так что соединения с базой открываются
+    и закрываются так же, как на боевом сервере.
+    """
+    handler = WSGIHandler()
+    environs = [RequestFactory().get(path).environ for path in paths]
+
+    def start_response(status, headers):
+        if not status.startswith('200'):
+            raise ValueError(f'Ответ {status}')
+
+    def worker(deadline):
+        served = 0
+        try:
+            while time.perf_counter() < deadline:
+                response = handler(
+                    dict(environs[served % len(environs)]), start_response)
+                response.close()
+                served += 1
+        finally:
+            connections.close_all()
+        return served
+
+    started = time.perf_counter()
+    deadline = started + duration
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        served = sum(pool.map(worker, [deadline] * threads))
+    return served / (time.perf_counter() - started)
+
+
+def calibrate(rounds=5):
+    """Медиана времени фиксированной нагрузки на этой машине, мс.
+
+    Отношение калибровки к записанной в эталоне переводит времена
+    эталона в масштаб текущей машины.
+    """
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        sum(number * number for number in range(BENCHMARK_CALIBRATION_LOOP))
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def compare(results, baseline, threshold, scale=1.0):
+    """Список регрессий относительно эталона.
+
+    Число запросов — регрессия при любом росте, и это основная
+    проверка: она не зависит от машины. Время (медиана и SQL)
+    сначала умножается на ``scale`` — отношение калибровок текущей
+    машины и эталонной — и считается регрессией, если выросло больше
+    чем в ``1 + threshold`` раз и при этом больше чем на
+    ``BENCHMARK_NOISE_MS``.
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric in ('p50_ms', 'sql_ms'):
+            expected = reference[metric] * scale
+            limit = max(
+                expected * (1 + threshold), expected + BENCHMARK_NOISE_MS)
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {reference[metric]} → '
+                    f'{current[metric]}')
+        if current['queries'] > reference['queries']:
+            regressions.append(
+                f'{name}: queries {reference["queries"]} → '
+                f'{current["queries"]}')
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w') as output:
+        json.dump(
+            {'meta': meta, 'views': results}, output,
+            indent=2, ensure_ascii=False, sort_keys=True)
+        output.write('\n')
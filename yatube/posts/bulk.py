@@ -0,0 +1,120 @@
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import AutoField
+from django.utils import timezone
+
+from . import counters, suggestions, timeline, trending
+from .caching import invalidate_feed, purge
+from .typeahead import typeahead
+
+
+def reserve_pks(model, count, using=DEFAULT_DB_ALIAS):
+    """Резервирует ``count`` подряд идущих id; вызывать внутри транзакции.
+
+    Таблицы SQLite у Django объявлены с ``AUTOINCREMENT``, так что
+    счётчик в ``sqlite_sequence`` только растёт: сдвиг под блокировкой
+    записи не пересекается с id, которые выдаёт база параллельным
+    вставкам, и не повторяет id удалённых строк.
+    """
+    table = model._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO sqlite_sequence (name, seq) '
+            f'SELECT %s, COALESCE(MAX({model._meta.pk.column}), 0) '
+            f'FROM {table} '
+            'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+            [table, table])
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s',
+            [count, table])
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+        last = cursor.fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+
+def _prepare(model, objects, dates):
+    """Значения полей, как их готовит ``save()``, кроме полей ``dates``.
+
+    Заданные даты остаются как есть, пустые получают текущее время.
+    """
+    now = timezone.now()
+    for obj in objects:
+        for field in model._meta.concrete_fields:
+            if field.name not in dates:
+                field.pre_save(obj, add=True)
+            elif getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, now)
+
+
+def _insert(model, objects, fields, using, return_id=False):
+    connection = connections[using]
+    size = connection.ops.bulk_batch_size(fields, objects) or len(objects)
+    manager = model._base_manager
+    for start in range(0, len(objects), size):
+        batch = objects[start:start + size]
+        # raw=True: значения берутся из объектов, без повторного pre_save.
+        ids = manager._insert(
+            batch, fields=fields, return_id=return_id, raw=True, using=using)
+        if not isinstance(ids, list):
+            ids = [ids]
+        for index, obj in enumerate(batch):
+            if return_id:
+                obj.pk = ids[index]
+            obj._state.adding = False
+            obj._state.db = using
+
+
+def insert(model, objects, dates=()):
+    """Пакетная вставка, после которой у объектов есть id.
+
+    Если база возвращает id вставленных строк, их выдаёт она сама.
+    SQLite этого не умеет, и объектам без id они резервируются заранее
+    через :func:`reserve_pks`; вызывать внутри транзакции. Поля из
+    ``dates`` записываются как есть, без ``auto_now_add``, а сигналы,
+    как и у ``bulk_create``, не отправляются.
+    """
+    if not objects:
+        return objects
+    using = DEFAULT_DB_ALIAS
+    connection = connections[using]
+    missing = [obj for obj in objects if obj.pk is None]
+    if missing and not connection.features.can_return_ids_from_bulk_insert:
+        for pk, obj in zip(reserve_pks(model, len(missing)), missing):
+            obj.pk = pk
+        missing = []
+    _prepare(model, objects, dates)
+    fields = model._meta.concrete_fields
+    with transaction.atomic(using=using, savepoint=False):
+        known = [obj for obj in objects if obj.pk is not None]
+        if known:
+            _insert(model, known, fields, using)
+        if missing:
+            fields = [
+                field for field in fields if not isinstance(field, AutoField)
+            ]
+            _insert(model, missing, fields, using, return_id=True)
+    return objects
+
+
+def rebuild_derived(authors=None, tags=()):
+    """То, что после обычного сохранения делают сигналы.
+
+    ``authors`` — авторы вставленных записей: ленты им уже разнесены,
+    а подсказки пересчитываются в фоне только для затронутых. Без
+    ``authors`` ленты и подсказки пересобираются целиком. ``tags``
+    сбрасываются в кэше страниц вместе с лентой. Возвращает число
+    исправленных счётчиков.
+    """
+    with transaction.atomic():
+        if authors is None:
+            timeline.rebuild()
+        reconciled = counters.reconcile()
+    if authors is None:
+        suggestions.rebuild()
+    else:
+        suggestions.schedule(suggestions.affected(authors))
+    trending.rebuild()
+    invalidate_feed()
+    purge('feed', *tags)
+    typeahead.invalidate()
+    return reconciled
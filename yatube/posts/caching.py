@@ -0,0 +1,200 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.timing import events
+
+from .constants import PAGE_CACHE_TIMEOUT
+from .models import User
+from .utils import InvalidCursor, decode_token
+
+FEED_GENERATION_KEY = 'posts:feed:generation'
+
+
+def feed_generation():
+    """Текущее поколение ленты: часть ключа кэша страниц ленты."""
+    cache.add(FEED_GENERATION_KEY, time.time_ns(), None)
+    return cache.get(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    """Сбрасывает кэш ленты, переходя к новому поколению ключей."""
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        cache.add(FEED_GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate_feed():
+    """Сбрасывает кэш сразу и ещё раз после фиксации транзакции.
+
+    Второй сброс убирает страницы, которые конкурентный запрос успел
+    закэшировать до коммита по старым данным.
+    """
+    bump_feed_generation()
+    transaction.on_commit(bump_feed_generation)
+
+
+PAGE_KEY_PREFIX = 'posts:page:'
+TAG_KEY_PREFIX = 'posts:tag:'
+PURGE_COUNTER_KEY = 'posts:purges'
+
+
+def _tag_keys(tags):
+    return {TAG_KEY_PREFIX + tag: tag for tag in tags}
+
+
+def _tag_versions(tags):
+    keys = _tag_keys(tags)
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, time.time_ns(), None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _is_fresh(versions):
+    keys = _tag_keys(versions)
+    found = cache.get_many(keys)
+    return all(
+        found.get(key) == versions[tag] for key, tag in keys.items()
+    )
+
+
+def _purge_count():
+    cache.add(PURGE_COUNTER_KEY, 0, None)
+    return cache.get(PURGE_COUNTER_KEY)
+
+
+def _purge(tags):
+    for key in _tag_keys(tags):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+    try:
+        cache.incr(PURGE_COUNTER_KEY)
+    except ValueError:
+        cache.add(PURGE_COUNTER_KEY, 1, None)
+
+
+def purge(*tags):
+    """Сбрасывает все закэшированные страницы с указанными ключами."""
+    _purge(tags)
+    transaction.on_commit(lambda: _purge(tags))
+
+
+def post_keys(posts):
+    """Суррогатные ключи для списка постов: посты, их авторы и группы.
+
+    Ключ ``user:<id>`` означает «на странице выводится имя автора»,
+    а ``author:<id>`` — «страница зависит от списка постов автора».
+    """
+    keys = set()
+    for post in posts:
+        keys.add(f'post:{post.pk}')
+        keys.add(f'user:{post.author_id}')
+        if post.group_id:
+            keys.add(f'group:{post.group_id}')
+    return keys
+
+
+def page_key(request):
+    """Ключ страницы в кэше: путь и только значимые параметры запроса.
+
+    Посторонние параметры, пустые значения, нечисловой ``page`` и
+    нераспознаваемый ``cursor`` отбрасываются, чтобы мусор в адресе
+    не плодил копии одной и той же страницы.
+    """
+    params = []
+    page = request.GET.get('page', '')
+    if page.isdigit():
+        params.append(('page', page))
+    cursor = request.GET.get('cursor', '')
+    if cursor:
+        try:
+            decode_token(cursor)
+        except InvalidCursor:
+            pass
+        else:
+            params.append(('cursor', cursor))
+    query = urlencode(params)
+    return PAGE_KEY_PREFIX + request.path + (f'?{query}' if query else '')
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницу целиком для анонимных читателей.
+
+    Представление помечает ответ атрибутом ``surrogate_keys``; запись
+    в кэше запоминает версии этих ключей и перестаёт считаться свежей,
+    как только любой из них сброшен через :func:`purge`. Если сброс
+    случился, пока страница строилась, она не кэшируется: иначе старые
+    данные легли бы в кэш вместе с уже новыми версиями ключей.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None and _is_fresh(cached[1]):
+            events.incr('page_cache_hits')
+            response = cached[0]
+            response['X-Cache'] = 'HIT'
+            return response
+        events.incr('page_cache_misses')
+        purges = _purge_count()
+        response = view(request, *args, **kwargs)
+        tags = getattr(response, 'surrogate_keys', None)
+        if tags and response.status_code == 200 and not response.cookies:
+            response['Surrogate-Key'] = ' '.join(sorted(tags))
+            versions = _tag_versions(tags)
+            if _purge_count() == purges:
+                cache.set(key, (response, versions), PAGE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+
+def _etag(request, *parts):
+    source = ':'.join(
+        str(part) for part in (
+            *parts, request.user.pk, request.get_full_path())
+    )
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+def feed_etag(request, *args, **kwargs):
+    """Валидатор лент: меняется вместе с поколением ленты."""
+    return _etag(request, feed_generation())
+
+
+def profile_etag(request, username):
+    """Валидатор профиля: учитывает ещё и подписки автора.
+
+    Для вошедшего читателя — и его подсказки «на кого подписаться».
+    Стоит одного запроса по уникальному индексу на ``username``. Для
+    несуществующего автора валидатора нет, чтобы 404 не превратился
+    в 304.
+    """
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    tags = [f'author:{author_id}']
+    if request.user.is_authenticated:
+        tags.append(f'suggestions:{request.user.pk}')
+    versions = _tag_versions(tags)
+    return _etag(
+        request, feed_generation(), *(versions[tag] for tag in tags))
+
+
+def post_etag(request, post_id):
+    """Валидатор страницы поста: сам пост и его комментарии."""
+    versions = _tag_versions([f'comments:{post_id}'])
+    return _etag(request, feed_generation(), *versions.values())
@@ -1,3 +1,53 @@
+from datetime import datetime, timezone
+
 NUMBER_OF_POSTS_PER_PAGE = 10
 TEXT_OUTPUT = 15
 VIEWS_TEST_FOR_SECOND_PAGE = 3
+CURSOR_ORDERING = ('-pub_date', '-pk')
+FOLLOW_CURSOR_ORDERING = ('-feed_date', '-feed_post')
+FEED_DEFERRED_FIELDS = (
+    'author__password',
+    'author__email',
+    'author__last_login',
+    'author__date_joined',
+    'group__description',
+)
+# Кэш — LocMem в памяти процесса: сброс виден только тому процессу,
+# где он случился, остальные отдают старое до истечения срока.
+# Поэтому сроки короткие, минуты, а не часы.
+FEED_CACHE_TIMEOUT = 60 * 5
+PAGE_CACHE_TIMEOUT = 60 * 5
+FEED_USER_FIELDS = ('username', 'first_name', 'last_name')
+THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+TYPEAHEAD_LIMIT = 10
+COMMENTS_PER_PAGE = 20
+COMMENT_ORDERING = ('created', 'pk')
+EXPORT_CHUNK_SIZE = 500
+EXPORT_CSV_COLUMNS = (
+    'type', 'id', 'created', 'text', 'group', 'post', 'author', 'image')
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_WORKERS = 4
+GENERATOR_CHUNK_SIZE = 5000
+GENERATOR_IMAGE_POOL = 20
+GENERATOR_IMAGE_SIZE = (960, 540)
+GENERATOR_PASSWORD = 'password'
+GENERATOR_ANCHOR = datetime(2024, 1, 1, tzinfo=timezone.utc)
+BENCHMARK_PERCENTILES = (50, 90, 99)
+BENCHMARK_THRESHOLD = 0.5
+BENCHMARK_NOISE_MS = 1.0
+BENCHMARK_CALIBRATION_LOOP = 10 ** 6
+RECONCILE_BATCH_SIZE = 500
+SUGGESTIONS_PER_USER = 10
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_BATCH_SIZE = 500
+SUGGESTION_SECOND_DEGREE_WEIGHT = 1.0
+SUGGESTION_CO_POSTING_WEIGHT = 0.5
+TRENDING_HALF_LIFE_HOURS = 6
+TRENDING_POST_WEIGHT = 1.0
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_SIZE = 10
+TRENDING_CAPACITY = 1000
+TRENDING_MIN_SCORE = 0.01
+TRENDING_WINDOW_DAYS = 7
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .constants import RECONCILE_BATCH_SIZE
+from .models import Comment, Follow, Post, Profile, User
+
+
+def bump(queryset, field, delta):
+    """Атомарно сдвигает счётчик в базе, не опуская его ниже нуля."""
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def _actual(queryset, field, outer='pk'):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def reconcile():
+    """Пересчитывает счётчики и исправляет расхождения.
+
+    Возвращает число исправленных строк.
+    """
+    Profile.objects.bulk_create(
+        [
+            Profile(user_id=user_id)
+            for user_id in User.objects.filter(
+                profile__isnull=True).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    counters = (
+        (Post, 'comments_count', _actual(Comment.objects, 'post')),
+        (Profile, 'posts_count',
+         _actual(Post.objects, 'author', 'user_id')),
+        (Profile, 'followers_count',
+         _actual(Follow.objects, 'author', 'user_id')),
+        (Profile, 'following_count',
+         _actual(Follow.objects, 'user', 'user_id')),
+    )
+    fixed = 0
+    for model, field, actual in counters:
+        drifted = list(model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', flat=True))
+        # SQLite ограничивает число параметров в одном запросе.
+        for start in range(0, len(drifted), RECONCILE_BATCH_SIZE):
+            fixed += model.objects.filter(
+                pk__in=drifted[start:start + RECONCILE_BATCH_SIZE]
+            ).update(**{field: actual})
+    return fixed
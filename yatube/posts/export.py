@@ -0,0 +1,132 @@
+import csv
+import json
+import os
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .constants import EXPORT_CHUNK_SIZE, EXPORT_CSV_COLUMNS
+from .models import Comment, Follow, Post
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+}
+
+
+def records(user):
+    """Посты, комментарии и подписки пользователя по одной записи.
+
+    Выборки обходятся через ``iterator()``, поэтому в памяти
+    одновременно лежит не больше одной пачки строк.
+    """
+    posts = Post.objects.filter(author=user).select_related(
+        'group').order_by('pk')
+    for post in posts.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'post',
+            'id': post.pk,
+            'created': post.pub_date,
+            'text': post.text,
+            'group': post.group.slug if post.group_id else None,
+            'image': post.image.name or None,
+        }
+    comments = Comment.objects.filter(author=user).order_by('pk')
+    for comment in comments.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'comment',
+            'id': comment.pk,
+            'created': comment.created,
+            'text': comment.text,
+            'post': comment.post_id,
+        }
+    follows = Follow.objects.filter(user=user).select_related(
+        'author').only('pk', 'author__username').order_by('pk')
+    for follow in follows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'type': 'follow',
+            'id': follow.pk,
+            'author': follow.author.username,
+        }
+
+
+def image_names(user):
+    return Post.objects.filter(author=user).exclude(image='').order_by(
+        'pk').values_list('image', flat=True).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(
+            row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Псевдофайл: ``write`` возвращает строку, а не копит её."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(
+        _Echo(), fieldnames=EXPORT_CSV_COLUMNS, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def lines(user, export_format):
+    if export_format == 'csv':
+        return csv_lines(records(user))
+    return ndjson_lines(records(user))
+
+
+class _ZipStream:
+    """Несмещаемый поток для ``zipfile``: отдаёт записанное по частям."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def zip_chunks(user, export_format, storage):
+    """Zip-архив с выгрузкой и картинками постов, собираемый на лету.
+
+    Без ``seek``/``tell`` ``zipfile`` пишет дескрипторы данных после
+    каждого файла, поэтому готовые байты отдаются сразу, а не после
+    сборки всего архива.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f'{user.username}.{export_format}', 'w') as entry:
+            for line in lines(user, export_format):
+                entry.write(line.encode())
+                yield from stream.drain()
+        for name in image_names(user):
+            if not storage.exists(name):
+                continue
+            with storage.open(name) as source, archive.open(
+                    os.path.join('images', name), 'w') as entry:
+                for chunk in source.chunks():
+                    entry.write(chunk)
+                    yield from stream.drain()
+    yield from stream.drain()
+
+
+def filename(user, export_format, with_images=False):
+    extension = 'zip' if with_images else export_format
+    return f'{user.username}-export.{extension}'
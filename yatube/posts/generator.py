@@ -0,0 +1,210 @@
+import io
+import random
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from . import bulk
+from .constants import (
+    GENERATOR_ANCHOR, GENERATOR_CHUNK_SIZE, GENERATOR_IMAGE_POOL,
+    GENERATOR_IMAGE_SIZE, GENERATOR_PASSWORD)
+from .models import Comment, Follow, Group, Post, User
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса закона Ципфа: ранг ``k`` весит ``1 / k**alpha``."""
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class DatasetGenerator:
+    """Синтетические данные в масштабе продакшена.
+
+    Популярность авторов и постов распределена по степенному закону:
+    немногие авторы собирают большую часть подписчиков, а немногие
+    посты — большую часть комментариев. Все случайные величины берутся
+    из одного ``random.Random(seed)``, а даты отсчитываются назад от
+    ``anchor``, так что набор воспроизводим.
+    Строки пишутся ``bulk_create`` пачками, каждая пачка — транзакция.
+    """
+
+    def __init__(self, seed=0, alpha=1.1, days=365, image_ratio=0.0,
+                 chunk_size=GENERATOR_CHUNK_SIZE, storage=None, log=None,
+                 anchor=GENERATOR_ANCHOR):
+        self.random = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.alpha = alpha
+        self.days = days
+        self.image_ratio = image_ratio
+        self.chunk_size = chunk_size
+        self.storage = storage
+        self.log = log or (lambda message: None)
+        self.now = anchor
+
+    def chunks(self, total):
+        for start in range(0, total, self.chunk_size):
+            yield min(self.chunk_size, total - start)
+
+    def past(self, after=None):
+        """Случайный момент после ``after`` (или за ``days`` дней)."""
+        start = after or self.now - timedelta(days=self.days)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.random.random() * span)
+
+    def generate(self, users, groups, posts, comments, follows_per_user):
+        user_ids = self.make_users(users)
+        group_ids = self.make_groups(groups)
+        # Ранг популярности не совпадает с порядком создания.
+        self.random.shuffle(user_ids)
+        self.make_follows(user_ids, follows_per_user)
+        post_ids, post_dates = self.make_posts(user_ids, group_ids, posts)
+        self.make_comments(user_ids, post_ids, post_dates, comments)
+        self.finish()
+
+    def make_users(self, total):
+        password = make_password(GENERATOR_PASSWORD)
+        user_ids = []
+        for size in self.chunks(total):
+            with transaction.atomic():
+                pks = bulk.reserve_pks(User, size)
+                users = bulk.insert(User, [
+                    User(
+                        pk=number,
+                        username=f'{self.faker.user_name()}_{number}',
+                        first_name=self.faker.first_name(),
+                        last_name=self.faker.last_name(),
+                        password=password,
+                        date_joined=self.past(),
+                    )
+                    for number in pks
+                ])
+            user_ids.extend(user.pk for user in users)
+        self.log(f'Пользователей: {total}')
+        return user_ids
+
+    def make_groups(self, total):
+        with transaction.atomic():
+            groups = bulk.insert(Group, [
+                Group(
+                    pk=number,
+                    title=self.faker.catch_phrase()[:200],
+                    slug=f'group-{number}',
+                    description=self.faker.paragraph(),
+                )
+                for number in bulk.reserve_pks(Group, total)
+            ])
+        self.log(f'Групп: {total}')
+        return [group.pk for group in groups]
+
+    def make_follows(self, user_ids, per_user):
+        """Граф подписок с предпочтительным присоединением.
+
+        Каждый подписывается на ``per_user`` авторов в среднем,
+        авторы выбираются с весами по степенному закону.
+        """
+        if not user_ids or not per_user:
+            return
+        weights = power_law_weights(len(user_ids), self.alpha)
+        created = 0
+        for start in range(0, len(user_ids), self.chunk_size):
+            follows = []
+            for user_id in user_ids[start:start + self.chunk_size]:
+                count = min(
+                    int(self.random.expovariate(1 / per_user)) + 1,
+                    len(user_ids) - 1)
+                authors = set(self.random.choices(
+                    user_ids, cum_weights=weights, k=count))
+                authors.discard(user_id)
+                follows.extend(
+                    Follow(user_id=user_id, author_id=author_id)
+                    for author_id in authors)
+            with transaction.atomic():
+                Follow.objects.bulk_create(follows, ignore_conflicts=True)
+            created += len(follows)
+        self.log(f'Подписок: {created}')
+
+    def make_images(self):
+        """Небольшой набор картинок, которые делят между собой посты."""
+        names = []
+        for number in range(GENERATOR_IMAGE_POOL):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', GENERATOR_IMAGE_SIZE, color).save(buffer, 'PNG')
+            names.append(self.storage.save(
+                f'posts/synthetic_{number}.png',
+                ContentFile(buffer.getvalue())))
+        return names
+
+    def make_posts(self, user_ids, group_ids, total):
+        """Посты; возвращает их id и даты по порядку.
+
+        Даты хранятся компактным массивом, чтобы выбирать время
+        комментариев без повторного чтения миллионов постов.
+        """
+        images = (
+            self.make_images()
+            if self.image_ratio and self.storage else []
+        )
+        weights = power_law_weights(len(user_ids), self.alpha)
+        post_ids = array('q')
+        dates = array('d')
+        for size in self.chunks(total):
+            posts = []
+            for _ in range(size):
+                pub_date = self.past()
+                dates.append(pub_date.timestamp())
+                posts.append(Post(
+                    text=self.faker.text(
+                        max_nb_chars=self.random.choice((80, 300, 1200))),
+                    author_id=self.random.choices(
+                        user_ids, cum_weights=weights)[0],
+                    group_id=(
+                        self.random.choice(group_ids)
+                        if group_ids and self.random.random() < 0.7
+                        else None),
+                    image=(
+                        self.random.choice(images)
+                        if images and self.random.random() < self.image_ratio
+                        else ''),
+                    pub_date=pub_date,
+                ))
+            with transaction.atomic():
+                bulk.insert(Post, posts, dates=('pub_date',))
+            post_ids.extend(post.pk for post in posts)
+            self.log(f'Постов: {len(dates)} из {total}')
+        return post_ids, dates
+
+    def make_comments(self, user_ids, post_ids, post_dates, total):
+        """Комментарии, сосредоточенные на «горячих» постах."""
+        if not post_dates:
+            return
+        ranks = list(range(len(post_dates)))
+        self.random.shuffle(ranks)
+        weights = power_law_weights(len(ranks), self.alpha)
+        for size in self.chunks(total):
+            comments = []
+            for index in self.random.choices(
+                    ranks, cum_weights=weights, k=size):
+                posted = datetime.fromtimestamp(
+                    post_dates[index], tz=timezone.utc)
+                comments.append(Comment(
+                    post_id=post_ids[index],
+                    author_id=self.random.choice(user_ids),
+                    text=self.faker.sentence(),
+                    created=self.past(after=posted),
+                ))
+            with transaction.atomic():
+                bulk.insert(Comment, comments, dates=('created',))
+        self.log(f'Комментариев: {total}')
+
+    def finish(self):
+        """То, что при обычном сохранении делают сигналы."""
+        self.log('Пересобираю ленты, счётчики, подсказки и популярное')
+        bulk.rebuild_derived()
@@ -0,0 +1,320 @@
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bulk, timeline
+from .constants import IMPORT_CHUNK_SIZE, IMPORT_WORKERS
+from .models import (
+    Comment, Follow, Group, ImportCheckpoint, ImportedPost, Post, User)
+
+RECORD_TYPES = ('post', 'comment', 'follow')
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def parse_date(value):
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise InvalidRecord(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+class Checkpoint:
+    """Сколько строк уже импортировано и какие id получили посты.
+
+    С ключом всё хранится в базе и пишется в транзакции пачки: после
+    сбоя нет ни пачки без отметки, ни отметки без пачки, и повторный
+    запуск продолжает с первой незаписанной строки. Соответствие
+    ``id`` выгрузки постам дописывается построчно. Без ключа оно
+    живёт только в памяти.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.record = None
+        self.line = 0
+        self.posts = {}
+        if key:
+            self.record, _ = ImportCheckpoint.objects.get_or_create(key=key)
+            self.line = self.record.line
+
+    @staticmethod
+    def reset(key):
+        ImportCheckpoint.objects.filter(key=key).delete()
+
+    def resolve(self, source_ids):
+        """Id постов для ``id`` из выгрузки, известных этой точке."""
+        source_ids = {str(source_id) for source_id in source_ids}
+        if self.record is None:
+            return {
+                source_id: self.posts[source_id]
+                for source_id in source_ids & self.posts.keys()
+            }
+        return dict(self.record.posts.filter(
+            source_id__in=source_ids).values_list('source_id', 'post_id'))
+
+    def add_posts(self, pairs):
+        """Запоминает пары ``(id в выгрузке, пост)``; внутри транзакции."""
+        pairs = {str(source_id): post_id for source_id, post_id in pairs}
+        if self.record is None:
+            self.posts.update(pairs)
+            return
+        ImportedPost.objects.bulk_create([
+            ImportedPost(
+                checkpoint=self.record, source_id=source_id, post_id=post_id)
+            for source_id, post_id in pairs.items()
+        ])
+
+    def advance(self, line):
+        """Отмечает строку как импортированную; внутри транзакции."""
+        self.line = line
+        if self.record is not None:
+            ImportCheckpoint.objects.filter(pk=self.record.pk).update(
+                line=line)
+
+
+class Importer:
+    """Пакетный импорт постов, комментариев и подписок из NDJSON.
+
+    Каждая строка — объект с полем ``type``: ``post``, ``comment`` или
+    ``follow``, в том же виде, что отдаёт выгрузка. Авторы и группы
+    ищутся по словарям в памяти, недостающие создаются пачкой. Записи
+    пишутся ``bulk_create`` по пачкам, каждая пачка — своя транзакция.
+
+    ``bulk_create`` не отправляет сигналы, поэтому ленты подписчиков
+    раскладываются прямо здесь, а счётчики и кэши страниц приводятся
+    в порядок в :meth:`finish`.
+    """
+
+    def __init__(self, storage, images_dir=None, default_author=None,
+                 chunk_size=IMPORT_CHUNK_SIZE, workers=IMPORT_WORKERS,
+                 checkpoint=None):
+        self.storage = storage
+        self.images_dir = images_dir
+        self.default_author = default_author
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint = checkpoint or Checkpoint(None)
+        self.users = {}
+        self.groups = {}
+        self.stats = Counter()
+        self.authors = set()
+        self.touched_groups = set()
+        self.commented = set()
+
+    def run(self, lines, progress=None):
+        """Импортирует строки, пропуская уже сделанные по контрольной точке.
+
+        ``progress`` вызывается после каждой пачки с числом строк
+        и скоростью в записях в секунду.
+        """
+        started = time.monotonic()
+        chunk = []
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='import')
+        with self.pool:
+            for number, line in enumerate(lines, 1):
+                if number <= self.checkpoint.line or not line.strip():
+                    continue
+                chunk.append((number, line))
+                if len(chunk) == self.chunk_size:
+                    self.import_chunk(chunk)
+                    chunk = []
+                    if progress:
+                        progress(self.checkpoint.line, self.rate(started))
+            if chunk:
+                self.import_chunk(chunk)
+        self.stats['seconds'] = time.monotonic() - started
+        return self.stats
+
+    def rate(self, started):
+        elapsed = time.monotonic() - started
+        imported = sum(self.stats[kind] for kind in RECORD_TYPES)
+        return imported / elapsed if elapsed else 0.0
+
+    def import_chunk(self, chunk):
+        grouped = {kind: [] for kind in RECORD_TYPES}
+        for number, line in chunk:
+            try:
+                record = json.loads(line)
+                grouped[record['type']].append(record)
+            except (ValueError, KeyError, TypeError):
+                self.stats['skipped'] += 1
+        self.copy_images(grouped['post'])
+        with transaction.atomic():
+            self.resolve(grouped)
+            self.import_posts(grouped['post'])
+            self.import_comments(grouped['comment'])
+            self.import_follows(grouped['follow'])
+            self.checkpoint.advance(chunk[-1][0])
+
+    def copy_images(self, records):
+        """Копирует картинки пачки в ``MEDIA_ROOT/posts/`` пулом потоков.
+
+        Копирование идёт до транзакции, чтобы не держать базу
+        заблокированной на время работы с файлами. Имя сохранённого
+        файла записывается в ``stored_image`` записи.
+        """
+        if not self.images_dir:
+            return
+        futures = [
+            (record, self.pool.submit(self.copy_image, record['image']))
+            for record in records if record.get('image')
+        ]
+        for record, future in futures:
+            record['stored_image'] = future.result()
+
+    def copy_image(self, name):
+        """Копирует картинку, если путь не выходит за ``images_dir``."""
+        root = os.path.realpath(self.images_dir)
+        path = os.path.realpath(os.path.join(root, name))
+        if (os.path.commonpath([root, path]) != root
+                or not os.path.isfile(path)):
+            return ''
+        with open(path, 'rb') as source:
+            return self.storage.save(
+                os.path.join('posts', os.path.basename(name)), File(source))
+
+    def _author(self, record, field='author'):
+        return record.get(field) or self.default_author
+
+    def resolve(self, grouped):
+        usernames = {
+            self._author(record) for kind in ('post', 'comment')
+            for record in grouped[kind]
+        }
+        for record in grouped['follow']:
+            usernames.add(self._author(record, 'user'))
+            usernames.add(record.get('author'))
+        usernames.discard(None)
+        self.users.update(self._ensure(
+            User, 'username', usernames - self.users.keys(),
+            self._new_user))
+        slugs = {record.get('group') for record in grouped['post']}
+        slugs.discard(None)
+        self.groups.update(self._ensure(
+            Group, 'slug', slugs - self.groups.keys(),
+            lambda slug: Group(title=slug, slug=slug, description='')))
+
+    @staticmethod
+    def _new_user(username):
+        user = User(username=username)
+        user.set_unusable_password()
+        return user
+
+    def _ensure(self, model, field, keys, factory):
+        """Ищет объекты по ключу, недостающие создаёт одной пачкой."""
+        if not keys:
+            return {}
+        found = dict(model.objects.filter(
+            **{f'{field}__in': keys}).values_list(field, 'pk'))
+        missing = keys - found.keys()
+        if missing:
+            model.objects.bulk_create(
+                [factory(key) for key in missing], ignore_conflicts=True)
+            found.update(model.objects.filter(
+                **{f'{field}__in': missing}).values_list(field, 'pk'))
+            self.stats[f'created_{model._meta.model_name}s'] += len(missing)
+        return found
+
+    def _bulk_insert(self, model, objects, dates, date_field):
+        now = timezone.now()
+        for obj, date in zip(objects, dates):
+            setattr(obj, date_field, date or now)
+        bulk.insert(model, objects, dates=(date_field,))
+
+    def import_posts(self, records):
+        posts, dates, source_ids = [], [], []
+        for record in records:
+            try:
+                author_id = self.users[self._author(record)]
+                dates.append(parse_date(record.get('created')))
+            except (KeyError, InvalidRecord):
+                self.stats['skipped'] += 1
+                continue
+            posts.append(Post(
+                text=record.get('text', ''),
+                author_id=author_id,
+                group_id=self.groups.get(record.get('group')),
+                image=record.get('stored_image', ''),
+            ))
+            source_ids.append(record.get('id'))
+        self._bulk_insert(Post, posts, dates, 'pub_date')
+        timeline.fan_out_many(posts)
+        self.checkpoint.add_posts(
+            (source_id, post.pk)
+            for source_id, post in zip(source_ids, posts)
+            if source_id is not None
+        )
+        for post in posts:
+            self.authors.add(post.author_id)
+            if post.group_id:
+                self.touched_groups.add(post.group_id)
+        self.stats['post'] += len(posts)
+
+    def import_comments(self, records):
+        comments, dates = [], []
+        posts = self.checkpoint.resolve(
+            record['post'] for record in records
+            if record.get('post') is not None)
+        for record in records:
+            try:
+                author_id = self.users[self._author(record)]
+                post_id = posts[str(record['post'])]
+                dates.append(parse_date(record.get('created')))
+            except (KeyError, InvalidRecord):
+                self.stats['skipped'] += 1
+                continue
+            comments.append(Comment(
+                text=record.get('text', ''),
+                author_id=author_id,
+                post_id=post_id,
+            ))
+        self._bulk_insert(Comment, comments, dates, 'created')
+        self.commented.update(comment.post_id for comment in comments)
+        self.stats['comment'] += len(comments)
+
+    def import_follows(self, records):
+        pairs = set()
+        for record in records:
+            user_id = self.users.get(self._author(record, 'user'))
+            author_id = self.users.get(record.get('author'))
+            if user_id is None or author_id is None or user_id == author_id:
+                self.stats['skipped'] += 1
+                continue
+            pairs.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs
+            ],
+            ignore_conflicts=True,
+        )
+        for user_id, author_id in pairs:
+            timeline.backfill(user_id, author_id)
+            self.authors.update((user_id, author_id))
+        self.stats['follow'] += len(pairs)
+
+    def finish(self):
+        """То, что при обычном сохранении делают сигналы."""
+        self.stats['reconciled'] = bulk.rebuild_derived(
+            authors=self.authors,
+            tags=(
+                *(f'author:{pk}' for pk in self.authors),
+                *(f'group:{pk}' for pk in self.touched_groups),
+                *(f'comments:{pk}' for pk in self.commented),
+            ),
+        )
@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+
+from posts import benchmark
+from posts.generator import DatasetGenerator
+
+PROFILES = {
+    'без настройки': {
+        'CONN_MAX_AGE': 0,
+        'SQLITE_PRAGMAS': {'journal_mode': 'DELETE'},
+    },
+    'боевой профиль': {
+        'CONN_MAX_AGE': settings.DATABASES[DEFAULT_DB_ALIAS]['CONN_MAX_AGE'],
+        'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает запросы в секунду без настройки соединений SQLite '
+        'и с боевым профилем на воспроизводимом наборе данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        aliases = (DEFAULT_DB_ALIAS, settings.READ_REPLICA_ALIAS)
+        saved = {
+            alias: dict(connections[alias].settings_dict)
+            for alias in aliases
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            connections.close_all()
+            connections[DEFAULT_DB_ALIAS].settings_dict['NAME'] = path
+            connections[settings.READ_REPLICA_ALIAS].settings_dict[
+                'NAME'] = f'file:{path}?mode=ro'
+            try:
+                self.run(options)
+            finally:
+                connections.close_all()
+                for alias in aliases:
+                    connections[alias].settings_dict.update(saved[alias])
+
+    def run(self, options):
+        call_command('migrate', verbosity=0)
+        DatasetGenerator(seed=options['seed']).generate(
+            users=options['users'],
+            groups=10,
+            posts=options['posts'],
+            comments=options['comments'],
+            follows_per_user=20,
+        )
+        paths = [
+            url for name, (url, user) in benchmark.targets().items()
+            if user is None
+        ]
+        results = {}
+        for name, profile in PROFILES.items():
+            connections.close_all()
+            for alias in (DEFAULT_DB_ALIAS, settings.READ_REPLICA_ALIAS):
+                connections[alias].settings_dict[
+                    'CONN_MAX_AGE'] = profile['CONN_MAX_AGE']
+            with override_settings(
+                    SQLITE_PRAGMAS=profile['SQLITE_PRAGMAS'],
+                    ALLOWED_HOSTS=['testserver'],
+                    CACHES={'default': {
+                        'BACKEND':
+                            'django.core.cache.backends.dummy.DummyCache',
+                    }}):
+                # Режим журнала меняет первое же пишущее соединение.
+                connections[DEFAULT_DB_ALIAS].ensure_connection()
+                connections.close_all()
+                results[name] = benchmark.throughput(
+                    paths, options['duration'], options['threads'])
+            self.stdout.write(f'{name}: {results[name]:.1f} запросов/с')
+        before, after = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {after / before:.2f}×'))
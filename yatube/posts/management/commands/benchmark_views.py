@@ -0,0 +1,104 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+from posts.constants import BENCHMARK_THRESHOLD
+
+DEFAULT_BASELINE = os.path.join(
+    settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет основные страницы на воспроизводимом наборе данных '
+        'во временной базе и сравнивает с эталоном. Число запросов '
+        'сравнивается строго; времена переносятся на текущую машину '
+        'по калибровке, но надёжнее всего снять эталон (--save) на той '
+        'же машине, где идёт проверка, например на CI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результаты как новый эталон')
+        parser.add_argument(
+            '--threshold', type=float, default=BENCHMARK_THRESHOLD,
+            help='Допустимый рост времени, доля от эталона')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кэш между запросами')
+        parser.add_argument(
+            '--view', action='append', choices=benchmark.VIEWS,
+            help='Замерить только эти страницы')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key] for key in (
+                'users', 'groups', 'posts', 'comments',
+                'follows_per_user', 'seed')
+        }
+        baseline = None
+        if not options['save']:
+            if not os.path.exists(options['baseline']):
+                raise CommandError(
+                    f'Нет эталона {options["baseline"]}, '
+                    'снимите его с --save')
+            baseline = benchmark.load_baseline(options['baseline'])
+            if baseline['meta']['dataset'] != dataset:
+                raise CommandError(
+                    'Эталон снят на другом наборе данных: '
+                    f'{baseline["meta"]["dataset"]}')
+
+        calibration = benchmark.calibrate()
+        results = self.measure(dataset, options)
+        self.report(results, baseline and baseline['views'])
+
+        if options['save']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            benchmark.save_baseline(options['baseline'], results, {
+                'dataset': dataset,
+                'iterations': options['iterations'],
+                'cold': not options['warm'],
+                'calibration_ms': calibration,
+            })
+            self.stdout.write(self.style.SUCCESS(
+                f'Эталон записан в {options["baseline"]}'))
+            return
+        reference = baseline['meta'].get('calibration_ms')
+        scale = calibration / reference if reference else 1.0
+        self.stdout.write(f'Масштаб времени к эталону: {scale:.2f}')
+        regressions = benchmark.compare(
+            results, baseline['views'], options['threshold'], scale)
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def measure(self, dataset, options):
+        with benchmark.seeded_database(**dataset):
+            return benchmark.run(
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                cold=not options['warm'],
+                views=options['view'] or benchmark.VIEWS,
+            )
+
+    def report(self, results, baseline):
+        for name, metrics in results.items():
+            line = ', '.join(
+                f'{metric} {value}' for metric, value in metrics.items())
+            reference = (baseline or {}).get(name)
+            if reference:
+                line += f' (эталон p50_ms {reference["p50_ms"]})'
+            self.stdout.write(f'{name}: {line}')
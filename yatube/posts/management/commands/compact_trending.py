@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+from posts.models import TrendingGroup, TrendingPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Уплотняет счета популярного: сдвигает точку отсчёта и '
+        'выбрасывает остывшее. Запускать периодически, например раз в час'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать счета заново по постам и комментариям')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            trending.rebuild()
+        else:
+            trending.compact()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов: {TrendingPost.objects.count()}, '
+            f'групп: {TrendingGroup.objects.count()}'
+        ))
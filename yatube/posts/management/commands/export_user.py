@@ -0,0 +1,40 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки пользователя'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default=export.FORMATS[0])
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Собрать выгрузку и картинки в zip-архив')
+        parser.add_argument(
+            '--output', help='Файл для записи, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        export_format = options['format']
+        if options['images']:
+            if not options['output']:
+                raise CommandError('Для архива нужен --output')
+            with open(options['output'], 'wb') as output:
+                for chunk in export.zip_chunks(
+                        user, export_format, default_storage):
+                    output.write(chunk)
+        elif options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(export.lines(user, export_format))
+        else:
+            for line in export.lines(user, export_format):
+                self.stdout.write(line, ending='')
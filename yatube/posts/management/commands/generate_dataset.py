@@ -0,0 +1,79 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.constants import (
+    GENERATOR_ANCHOR, GENERATOR_CHUNK_SIZE, GENERATOR_PASSWORD)
+from posts.generator import DatasetGenerator
+
+
+def anchor(value):
+    if value == 'now':
+        return timezone.now()
+    date = parse_datetime(value) or parse_datetime(f'{value}T00:00:00')
+    if date is None:
+        raise ValueError(value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, '
+        'постами, подписками и комментариями для нагрузочных тестов. '
+        f'Пароль у всех пользователей — «{GENERATOR_PASSWORD}».'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок у пользователя')
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного закона популярности')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней разбросать даты публикаций')
+        parser.add_argument(
+            '--anchor', type=anchor, default=GENERATOR_ANCHOR,
+            help='Самая поздняя дата набора (ISO 8601), по умолчанию '
+                 f'{GENERATOR_ANCHOR.date()}; now — текущий момент')
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--chunk-size', type=int, default=GENERATOR_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            alpha=options['alpha'],
+            days=options['days'],
+            anchor=options['anchor'],
+            image_ratio=options['images'],
+            chunk_size=options['chunk_size'],
+            storage=default_storage,
+            log=self.log,
+        )
+        generator.generate(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows_per_user=options['follows_per_user'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с'))
+
+    def log(self, message):
+        self.stdout.write(message)
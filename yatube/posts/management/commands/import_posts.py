@@ -0,0 +1,65 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.constants import IMPORT_CHUNK_SIZE, IMPORT_WORKERS
+from posts.importer import Checkpoint, Importer
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты, комментарии и подписки из NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON')
+        parser.add_argument(
+            '--images-dir',
+            help='Каталог, относительно которого указаны картинки постов')
+        parser.add_argument(
+            '--user',
+            help='Автор записей, в которых он не указан (как в выгрузке)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=IMPORT_WORKERS)
+        parser.add_argument(
+            '--checkpoint',
+            help='Имя контрольной точки, по умолчанию полный путь к файлу')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать заново, не глядя на контрольную точку')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        key = options['checkpoint'] or os.path.abspath(path)
+        if options['restart']:
+            Checkpoint.reset(key)
+        checkpoint = Checkpoint(key)
+        if checkpoint.line:
+            self.stdout.write(
+                f'Продолжаю со строки {checkpoint.line + 1}')
+        importer = Importer(
+            default_storage,
+            images_dir=options['images_dir'],
+            default_author=options['user'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            checkpoint=checkpoint,
+        )
+        with open(path) as source:
+            stats = importer.run(source, progress=self.progress)
+        importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            'Импортировано: постов {post}, комментариев {comment}, '
+            'подписок {follow}; пропущено {skipped} за {seconds:.1f} с '
+            '({rate:.0f} записей/с)'.format(
+                rate=sum(stats[kind] for kind in ('post', 'comment', 'follow'))
+                / stats['seconds'] if stats['seconds'] else 0.0,
+                **{key: stats[key] for key in (
+                    'post', 'comment', 'follow', 'skipped', 'seconds')},
+            )
+        ))
+
+    def progress(self, line, rate):
+        self.stdout.write(f'Строка {line}: {rate:.0f} записей/с')
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import advisor, benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет планы запросов основных страниц через EXPLAIN QUERY '
+        'PLAN и отмечает полные просмотры таблиц и временные сортировки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--view', action='append', choices=benchmark.VIEWS,
+            help='Проверить только эти страницы')
+        parser.add_argument(
+            '--current', action='store_true',
+            help='Проверять рабочую базу, а не временную с набором данных')
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных')
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемы')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--follows-per-user', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['current']:
+            report = self.inspect(options)
+        else:
+            with benchmark.seeded_database(**{
+                key: options[key] for key in (
+                    'users', 'groups', 'posts', 'comments',
+                    'follows_per_user', 'seed')
+            }):
+                report = self.inspect(options)
+        flagged = self.report(report, options['plans'])
+        if flagged and options['strict']:
+            raise CommandError(f'Проблемных запросов: {flagged}')
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS('Проблем не найдено'))
+
+    def inspect(self, options):
+        views = options['view'] or benchmark.VIEWS
+        return advisor.advise({
+            name: target for name, target in benchmark.targets().items()
+            if name in views
+        })
+
+    def report(self, report, plans):
+        flagged = 0
+        for name, queries in report.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: запросов {len(queries)}'))
+            for query in queries:
+                if query['problems']:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(
+                        '  ' + '; '.join(query['problems'])))
+                elif not plans:
+                    continue
+                self.stdout.write(f'  {query["shape"]}')
+                for line in query['plan']:
+                    self.stdout.write(f'    {line}')
+        return flagged
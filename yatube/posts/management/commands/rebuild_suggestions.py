@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает подсказки «на кого подписаться» для всех'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {suggestions.rebuild()}'
+        ))
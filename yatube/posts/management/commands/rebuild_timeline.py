@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок (таблицу Timeline) с нуля'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            timeline.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {Timeline.objects.count()}'
+        ))
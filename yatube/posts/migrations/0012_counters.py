@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('posts', 'Profile')
+
+    def actual(model, field, outer):
+        return Coalesce(models.Subquery(
+            model.objects.filter(**{field: models.OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count('pk'))
+            .values('total')
+        ), 0)
+
+    Profile.objects.bulk_create(
+        Profile(user_id=user_id)
+        for user_id in User.objects.values_list('pk', flat=True)
+    )
+    Post.objects.update(comments_count=actual(Comment, 'post', 'pk'))
+    Profile.objects.update(
+        posts_count=actual(Post, 'author', 'user_id'),
+        followers_count=actual(Follow, 'author', 'user_id'),
+        following_count=actual(Follow, 'user', 'user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of comments'),
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='number of posts')),
+                ('followers_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='number of followers')),
+                ('following_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='number of followed authors')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Профиль',
+                'verbose_name_plural': 'Профили',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
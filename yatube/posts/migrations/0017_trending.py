@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_suggestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingGroup',
+            fields=[
+                ('score', models.FloatField(default=0)),
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Group')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('score', models.FloatField(default=0)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingpost',
+            index=models.Index(fields=['-score'], name='trending_post_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendinggroup',
+            index=models.Index(fields=['-score'], name='trending_group_score_idx'),
+        ),
+    ]
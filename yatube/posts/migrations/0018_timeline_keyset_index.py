@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_trending'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timeline',
+            name='timeline_user_pub_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_idx'),
+        ),
+    ]
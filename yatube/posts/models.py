@@ -20,6 +20,19 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self, with_comments=False):
+        """Посты для ленты: автор и группа одним запросом."""
+        queryset = self.select_related('author', 'group').defer(
+            *constants.FEED_DEFERRED_FIELDS
+        )
+        if with_comments:
+            queryset = queryset.annotate(
+                comment_count=models.Count('comments')
+            )
+        return queryset
+
+
 class Post(models.Model):
     text = models.TextField("post text")
     pub_date = models.DateTimeField("post publication date",
@@ -41,9 +54,24 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        "number of comments", default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = (
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -67,6 +95,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['created']
+        indexes = (models.Index(
+            fields=['post', 'created'], name='comment_post_created_idx'
+        ),)
 
     def __str__(self):
         return self.text
@@ -88,3 +119,154 @@ class Follow(models.Model):
         constraints = (models.UniqueConstraint(
             fields=['user', 'author'], name='follow_constraint'
         ),)
+        indexes = (models.Index(
+            fields=['author', 'user'], name='follow_author_user_idx'
+        ),)
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = (models.UniqueConstraint(
+            fields=['user', 'post'], name='timeline_constraint'
+        ),)
+        indexes = (models.Index(
+            fields=['user', '-pub_date', '-post'],
+            name='timeline_user_pub_date_idx'
+        ),)
+
+
+class Suggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions'
+    )
+    candidate = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['-score']
+        constraints = (models.UniqueConstraint(
+            fields=['user', 'candidate'], name='suggestion_constraint'
+        ),)
+        indexes = (models.Index(
+            fields=['user', '-score'], name='suggestion_user_score_idx'
+        ),)
+
+
+class TrendingScore(models.Model):
+    """Счёт с прямым затуханием: события взвешены от точки отсчёта."""
+
+    score = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['-score']
+
+
+class TrendingPost(TrendingScore):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+
+    class Meta(TrendingScore.Meta):
+        indexes = (models.Index(
+            fields=['-score'], name='trending_post_score_idx'
+        ),)
+
+
+class TrendingGroup(TrendingScore):
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending'
+    )
+
+    class Meta(TrendingScore.Meta):
+        indexes = (models.Index(
+            fields=['-score'], name='trending_group_score_idx'
+        ),)
+
+
+class TrendingEpoch(models.Model):
+    """Точка отсчёта весов; сдвигается при уплотнении."""
+
+    started = models.DateTimeField()
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько строк выгрузки уже импортировано.
+
+    Пишется в той же транзакции, что и пачка записей, поэтому
+    прерванный импорт продолжается ровно с первой незаписанной строки.
+    """
+
+    key = models.CharField(max_length=255, unique=True)
+    line = models.PositiveIntegerField(default=0)
+
+
+class ImportedPost(models.Model):
+    """Какой пост получил запись выгрузки с данным ``id``."""
+
+    checkpoint = models.ForeignKey(
+        ImportCheckpoint,
+        on_delete=models.CASCADE,
+        related_name='posts'
+    )
+    source_id = models.CharField(max_length=255)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    class Meta:
+        constraints = (models.UniqueConstraint(
+            fields=['checkpoint', 'source_id'],
+            name='imported_post_constraint'
+        ),)
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField(
+        "number of posts", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        "number of followers", default=0, editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        "number of followed authors", default=0, editable=False
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
@@ -0,0 +1,102 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .constants import NUMBER_OF_POSTS_PER_PAGE
+from .models import Post
+from .utils import InvalidCursor, decode_token, encode_token
+
+TERM_RE = re.compile(r'\w+')
+
+SEARCH_SQL = (
+    'SELECT rowid, rank FROM posts_post_fts '
+    'WHERE posts_post_fts MATCH %s {seek}'
+    'ORDER BY rank, rowid LIMIT %s'
+)
+SEEK_SQL = 'AND (rank > %s OR (rank = %s AND rowid > %s)) '
+MATCHING_SQL = 'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+
+
+def match_expression(query):
+    """Превращает пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки, последнее ищется как префикс,
+    поэтому операторы FTS5 во вводе не интерпретируются.
+    """
+    terms = [f'"{term}"' for term in TERM_RE.findall(query)]
+    if not terms:
+        return None
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SearchPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def search_posts(query, cursor=None, per_page=NUMBER_OF_POSTS_PER_PAGE):
+    """Ищет посты по индексу FTS5 с ранжированием BM25.
+
+    Страницы листаются курсором по паре ``(rank, id)``.
+    """
+    match = match_expression(query)
+    if match is None:
+        return SearchPage([], None)
+    seek, params = '', [match]
+    if cursor:
+        try:
+            post_id, rank = decode_token(cursor)
+            post_id, rank = int(post_id), float(rank)
+        except (InvalidCursor, TypeError, ValueError):
+            pass
+        else:
+            seek = SEEK_SQL
+            params += [rank, rank, post_id]
+    with connection.cursor() as db:
+        db.execute(SEARCH_SQL.format(seek=seek), params + [per_page + 1])
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_token(list(rows[-1]))
+    posts = Post.objects.for_feed().in_bulk([post_id for post_id, _ in rows])
+    return SearchPage(
+        [posts[post_id] for post_id, _ in rows if post_id in posts],
+        next_cursor,
+    )
+
+
+class MatchingIds(RawSQL):
+    """Подзапрос id постов, подходящих под запрос, для ``pk__in``.
+
+    Лукап ``in`` сам берёт подзапрос в скобки. Вторые скобки, которые
+    добавил бы ``RawSQL``, SQLite прочёл бы как скалярный подзапрос и
+    взял только первую строку.
+    """
+
+    def __init__(self, query):
+        super().__init__(MATCHING_SQL, [match_expression(query)])
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def filter_matching(queryset, query):
+    """Оставляет в выборке постов только подходящие под запрос.
+
+    Условие ``id IN (SELECT rowid ...)`` даёт SQLite пройти от индекса
+    FTS5 к постам по первичному ключу, без просмотра всей таблицы.
+    """
+    return queryset.filter(pk__in=MatchingIds(query))
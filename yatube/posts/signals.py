@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import suggestions, timeline, trending
+from .caching import invalidate_feed, purge
+from .constants import FEED_USER_FIELDS
+from .counters import bump
+from .models import Comment, Follow, Group, Post, Profile, User
+from .thumbnails import evict_image
+from .typeahead import typeahead
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=User)
+def feed_changed(sender, **kwargs):
+    invalidate_feed()
+
+
+@receiver(pre_save, sender=User)
+def author_changing(sender, instance, update_fields=None, **kwargs):
+    fields = FEED_USER_FIELDS
+    if update_fields is not None:
+        fields = [name for name in fields if name in update_fields]
+    instance._feed_changed = False
+    if instance.pk is None or not fields:
+        return
+    old = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._feed_changed = old is not None and any(
+        old[name] != getattr(instance, name) for name in fields)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, **kwargs):
+    if getattr(instance, '_feed_changed', False):
+        invalidate_feed()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+        bump(Profile.objects.filter(user_id=instance.author_id),
+             'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(Profile.objects.filter(user_id=instance.author_id),
+         'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+        bump(Profile.objects.filter(user_id=instance.author_id),
+             'followers_count', 1)
+        bump(Profile.objects.filter(user_id=instance.user_id),
+             'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+    bump(Profile.objects.filter(user_id=instance.author_id),
+         'followers_count', -1)
+    bump(Profile.objects.filter(user_id=instance.user_id),
+         'following_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed_suggestions(sender, instance, **kwargs):
+    if kwargs.get('created', True):
+        suggestions.schedule(suggestions.affected([instance.user_id]))
+
+
+@receiver(post_save, sender=Post)
+def post_created_suggestions(sender, instance, created, **kwargs):
+    # Новая группа автора даёт ему новых соавторов; остальные участники
+    # группы увидят его при своём следующем пересчёте.
+    if created and instance.group_id:
+        suggestions.schedule([instance.author_id])
+
+
+@receiver(post_save, sender=Post)
+def post_created_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.post_published(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.comment_added(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    purge('feed', f'author:{instance.author_id}',
+          f'group:{instance.group_id}', f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, **kwargs):
+    purge(f'comments:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    purge(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_follow_pages(sender, instance, **kwargs):
+    purge(f'author:{instance.author_id}', f'author:{instance.user_id}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def purge_author_pages(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        purge(f'author:{instance.pk}', f'user:{instance.pk}')
+
+
+@receiver(pre_save, sender=Post)
+def post_image_changed(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (
+            update_fields is not None and 'image' not in update_fields):
+        return
+    old_image = Post.objects.filter(
+        pk=instance.pk).values_list('image', flat=True).first()
+    if old_image != instance.image.name:
+        evict_image(old_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    evict_image(instance.image.name)
+
+
+@receiver(post_save, sender=User)
+def user_typeahead(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    pk, username = instance.pk, instance.username
+    transaction.on_commit(lambda: typeahead.add_user(pk, username))
+
+
+@receiver(post_save, sender=Group)
+def group_typeahead(sender, instance, **kwargs):
+    pk, slug, title = instance.pk, instance.slug, instance.title
+    transaction.on_commit(lambda: typeahead.add_group(pk, slug, title))
+
+
+@receiver(post_delete, sender=User)
+def user_typeahead_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.remove_user(pk))
+
+
+@receiver(post_delete, sender=Group)
+def group_typeahead_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.remove_group(pk))
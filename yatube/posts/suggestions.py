@@ -0,0 +1,152 @@
+import heapq
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+
+from core.background import BackgroundPool
+
+from .caching import purge
+from .constants import (
+    SUGGESTION_CO_POSTING_WEIGHT, SUGGESTION_SECOND_DEGREE_WEIGHT,
+    SUGGESTIONS_BATCH_SIZE, SUGGESTIONS_PER_USER, SUGGESTIONS_SHOWN)
+from .models import Follow, Post, Suggestion, User
+
+logger = logging.getLogger(__name__)
+
+pool = BackgroundPool('SUGGESTION_WORKERS', 'suggestions')
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), SUGGESTIONS_BATCH_SIZE):
+        yield ids[start:start + SUGGESTIONS_BATCH_SIZE]
+
+
+def candidates(user_ids):
+    """Лучшие кандидаты в подписки: ``{id: [(id автора, вес), ...]}``.
+
+    Вес складывается из двух частей: сколькими путями автор достижим
+    через тех, на кого пользователь уже подписан, и во скольких общих
+    группах они оба публиковались. Сам пользователь и авторы, на
+    которых он уже подписан, отбрасываются. Пачка пользователей
+    считается за четыре запроса, а не за четыре на каждого.
+    """
+    user_ids = list(user_ids)
+    scores = {user_id: defaultdict(float) for user_id in user_ids}
+    followed = defaultdict(set)
+    for user_id, author_id in Follow.objects.filter(
+            user_id__in=user_ids).values_list('user_id', 'author_id'):
+        followed[user_id].add(author_id)
+    second_degree = Follow.objects.filter(
+        user__following__user_id__in=user_ids).order_by().values(
+        'user__following__user_id', 'author_id').annotate(
+        paths=Count('pk')).values_list(
+        'user__following__user_id', 'author_id', 'paths')
+    for user_id, author_id, paths in second_degree:
+        scores[user_id][author_id] += SUGGESTION_SECOND_DEGREE_WEIGHT * paths
+    groups = defaultdict(set)
+    own_posts = Post.objects.filter(
+        author_id__in=user_ids, group__isnull=False).order_by()
+    for user_id, group_id in own_posts.values_list(
+            'author_id', 'group_id').distinct():
+        groups[user_id].add(group_id)
+    posters = defaultdict(set)
+    group_posts = Post.objects.filter(
+        group_id__in=set().union(*groups.values())).order_by()
+    for group_id, author_id in group_posts.values_list(
+            'group_id', 'author_id').distinct():
+        posters[group_id].add(author_id)
+    for user_id, user_groups in groups.items():
+        for group_id in user_groups:
+            for author_id in posters[group_id]:
+                scores[user_id][author_id] += SUGGESTION_CO_POSTING_WEIGHT
+    result = {}
+    for user_id, user_scores in scores.items():
+        user_scores.pop(user_id, None)
+        for author_id in followed[user_id]:
+            user_scores.pop(author_id, None)
+        result[user_id] = heapq.nlargest(
+            SUGGESTIONS_PER_USER, user_scores.items(),
+            key=lambda item: (item[1], -item[0]))
+    return result
+
+
+def refresh(user_ids):
+    """Пересчитывает сохранённые подсказки для пользователей.
+
+    Пачка пользователей — одна транзакция; после неё сбрасываются
+    ключи ``suggestions:<id>``, от которых зависят ETag страниц.
+    """
+    refreshed = 0
+    for batch in _batches(user_ids):
+        batch = list(User.objects.filter(
+            pk__in=batch).values_list('pk', flat=True))
+        found = candidates(batch)
+        with transaction.atomic():
+            Suggestion.objects.filter(user_id__in=batch).delete()
+            Suggestion.objects.bulk_create([
+                Suggestion(
+                    user_id=user_id, candidate_id=candidate_id, score=score)
+                for user_id in batch
+                for candidate_id, score in found[user_id]
+            ])
+            purge(*(f'suggestions:{user_id}' for user_id in batch))
+        refreshed += len(batch)
+    return refreshed
+
+
+def rebuild():
+    """Пересчитывает подсказки для всех пользователей."""
+    return refresh(User.objects.values_list('pk', flat=True).iterator())
+
+
+def affected(user_ids):
+    """Чьи подсказки меняет подписка или отписка этих пользователей.
+
+    Кроме них самих — их подписчики: у тех меняются связи второго
+    порядка.
+    """
+    result = set(user_ids)
+    for batch in _batches(result.copy()):
+        result.update(Follow.objects.filter(
+            author_id__in=batch).values_list('user_id', flat=True))
+    return result
+
+
+def _refresh(user_ids):
+    # Снимаем отметку до пересчёта: изменение, пришедшее во время
+    # пересчёта, поставит пользователя в очередь заново.
+    pool.release(user_ids)
+    try:
+        refresh(user_ids)
+    except Exception:
+        logger.exception('Не удалось пересчитать подсказки')
+
+
+def _submit(user_ids):
+    user_ids = pool.claim(user_ids)
+    if user_ids:
+        pool.run(_refresh, user_ids)
+
+
+def schedule(user_ids):
+    """Ставит пересчёт подсказок в фоновую очередь после коммита.
+
+    Пользователи, уже ждущие пересчёта, повторно не добавляются.
+    При ``SUGGESTION_WORKERS = 0`` пересчёт идёт сразу в том же потоке.
+    """
+    user_ids = frozenset(user_ids)
+    transaction.on_commit(lambda: _submit(user_ids))
+
+
+def for_user(user):
+    """Подсказки для показа: один запрос по индексу ``(user, -score)``."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        Suggestion.objects.filter(user=user).select_related(
+            'candidate').only(
+            'candidate__username', 'candidate__first_name',
+            'candidate__last_name')[:SUGGESTIONS_SHOWN])
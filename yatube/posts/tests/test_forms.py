@@ -1,11 +1,20 @@
 import tempfile
+from unittest import mock
 
 from django.test import TestCase, Client, override_settings
 from django.conf import settings
 from django.urls import reverse
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
 
+from posts import thumbnails
+from posts.caching import feed_generation
+from posts.constants import THUMBNAIL_GEOMETRIES
 from posts.models import Comment, Group, Post, User
+from posts.thumbnails import kvstore_lru, pregenerate
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -28,7 +37,7 @@ class PostCreateForm(TestCase):
         )
 
     def setUp(self):
-        super().setUpClass()
+        super().setUp()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -153,3 +162,68 @@ class PostCreateForm(TestCase):
             'users:login') + '?next=' + reverse(
                 'posts:add_comment', kwargs={'post_id': new_post.pk}))
         self.assertEqual(Comment.objects.count(), comments_count)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumbnail')
+        small_gif = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                     b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                     b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                     b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                     b'\x0A\x00\x3B')
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=small_gif, content_type='image/gif')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_falls_back_to_original_image(self):
+        """Пока миниатюры нет, страница показывает исходную картинку"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertContains(response, self.post.image.url)
+        for geometry, options in THUMBNAIL_GEOMETRIES:
+            ThumbnailBackend().get_thumbnail(
+                self.post.image, geometry, **options)
+        cache.clear()
+        response = self.client.get(url)
+        self.assertNotContains(response, self.post.image.url)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_ready_thumbnail_purges_only_its_post(self):
+        """Готовая миниатюра сбрасывает страницы своего поста, не ленту"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        generation = feed_generation()
+        with mock.patch.object(
+                thumbnails.transaction, 'on_commit', lambda func: func()):
+            pregenerate(self.post.image, self.post.pk)
+        self.assertEqual(feed_generation(), generation)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_kvstore_lru(self):
+        """LRU перед хранилищем миниатюр считает попадания и сбрасывается"""
+        kvstore_lru.clear()
+        geometry, options = THUMBNAIL_GEOMETRIES[0]
+        ThumbnailBackend().get_thumbnail(self.post.image, geometry, **options)
+        hits = kvstore_lru.stats()['hits']
+        ThumbnailBackend().get_thumbnail(self.post.image, geometry, **options)
+        self.assertGreater(kvstore_lru.stats()['hits'], hits)
+        source_key = add_prefix(ImageFile(self.post.image.name).key)
+        self.assertIsNotNone(kvstore_lru.peek(source_key))
+        post = Post.objects.get(pk=self.post.pk)
+        post.image = ''
+        post.save()
+        self.assertIsNone(kvstore_lru.peek(source_key))
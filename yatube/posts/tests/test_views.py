@@ -1,12 +1,43 @@
-from django.test import TestCase, Client
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.core.paginator import Page
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts.models import (
+    Comment, Follow, Group, Post, Profile, Suggestion, Timeline,
+    TrendingEpoch, TrendingGroup, TrendingPost, User)
 from posts.forms import PostForm, CommentForm
+from posts import (
+    advisor, benchmark, bulk, signals, suggestions, trending, views)
+from posts import typeahead as typeahead_module
+from core.timing import events
+from posts.caching import feed_generation, purge
+from posts.importer import Importer
+from posts.search import search_posts
+from posts.typeahead import typeahead
 from posts.constants import (
-    NUMBER_OF_POSTS_PER_PAGE, VIEWS_TEST_FOR_SECOND_PAGE)
+    COMMENTS_PER_PAGE, NUMBER_OF_POSTS_PER_PAGE, TRENDING_HALF_LIFE_HOURS,
+    VIEWS_TEST_FOR_SECOND_PAGE)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class PostViewsTests(TestCase):
@@ -180,14 +211,15 @@ class PostViewsTests(TestCase):
         """Кэширование работает корректно"""
         response = self.authorized_author.get(reverse('posts:index'))
         data_cache = response.content
-        Post.objects.all().delete()
+        Post.objects.update(text='Изменено в обход сигналов')
         response = self.authorized_author.get(reverse('posts:index'))
-        deleted_but_in_cache = response.content
-        cache.clear()
+        still_cached = response.content
+        Post.objects.all().delete()
         response = self.authorized_author.get(reverse('posts:index'))
-        empty_cache = response.content
-        self.assertEqual(data_cache, deleted_but_in_cache)
-        self.assertNotEqual(deleted_but_in_cache, empty_cache)
+        invalidated = response.content
+        self.assertEqual(data_cache, still_cached)
+        self.assertNotEqual(still_cached, invalidated)
+        self.assertNotIn(self.post.text.encode(), invalidated)
 
 
 class PaginatorViewsTest(TestCase):
@@ -209,6 +241,9 @@ class PaginatorViewsTest(TestCase):
             ))
         Post.objects.bulk_create(cls.posts_count)
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         """На первой странице отображается десять записей"""
         views_responses = {
@@ -244,6 +279,122 @@ class PaginatorViewsTest(TestCase):
                 response = responses.context['page_obj']
                 self.assertEqual(len(response), number)
 
+    def test_cursor_pages(self):
+        """Курсорная пагинация листает страницы вперёд и назад"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertFalse(first.has_previous())
+                self.assertTrue(first.has_next())
+                second = self.client.get(
+                    url, {'cursor': first.next_cursor}).context['page_obj']
+                self.assertEqual(len(second), VIEWS_TEST_FOR_SECOND_PAGE)
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    set(first) & set(second), set())
+                back = self.client.get(
+                    url, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+                self.assertFalse(back.has_previous())
+
+    def test_index_cache_is_page_aware(self):
+        """Кэш главной страницы различает страницы"""
+        first = self.client.get(reverse('posts:index'))
+        second = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+
+    def test_invalid_cursor_opens_first_page(self):
+        """Некорректный курсор открывает первую страницу"""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'})
+        self.assertEqual(
+            len(response.context['page_obj']), NUMBER_OF_POSTS_PER_PAGE)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='test title',
+            slug='test-slug-queries',
+            description='test'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(NUMBER_OF_POSTS_PER_PAGE):
+            author = User.objects.create_user(username=f'author{i}')
+            Post.objects.create(
+                text=f'Тестовый текст {i}', author=author, group=cls.group)
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_query_count(self):
+        """Число запросов на страницу ленты не зависит от числа постов"""
+        pages = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 2,
+            reverse('posts:profile', kwargs={
+                'username': self.post.author.username}): 3,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                2,
+        }
+        for page, queries in pages.items():
+            with self.subTest(page=page):
+                with self.assertNumQueries(queries):
+                    self.client.get(page)
+
+    def test_cached_index_skips_feed_query(self):
+        """Главная страница из кэша не обращается к базе"""
+        self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:index'))
+
+    def test_follow_index_query_count(self):
+        """Лента подписок не делает запросов на каждый пост"""
+        client = Client()
+        client.force_login(self.reader)
+        with self.assertNumQueries(4):
+            response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            len(response.context['page_obj']), NUMBER_OF_POSTS_PER_PAGE)
+
+    def test_follow_index_pages_by_cursor(self):
+        """Лента подписок листается курсором без COUNT и OFFSET"""
+        Post.objects.create(text='Ещё пост', author=self.post.author)
+        client = Client()
+        client.force_login(self.reader)
+        with CaptureQueriesContext(connection) as context:
+            first = client.get(reverse('posts:follow_index'))
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] or 'OFFSET' in query['sql']
+            for query in context.captured_queries))
+        page = first.context['page_obj']
+        self.assertIs(type(page), Page)
+        self.assertEqual(len(page), NUMBER_OF_POSTS_PER_PAGE)
+        self.assertTrue(page.has_next())
+        second = client.get(
+            reverse('posts:follow_index'), {'cursor': page.next_cursor})
+        rest = list(second.context['page_obj'])
+        self.assertEqual(len(rest), 1)
+        self.assertNotIn(rest[0], list(page))
+        self.assertFalse(second.context['page_obj'].has_next())
+
+    def test_comment_count_annotation(self):
+        """for_feed(with_comments=True) добавляет число комментариев"""
+        Comment.objects.create(
+            text='comment', post=self.post, author=self.reader)
+        post = Post.objects.for_feed(with_comments=True).get(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 1)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -291,3 +442,925 @@ class FollowTest(TestCase):
         Follow.objects.all().delete()
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertNotIn(self.post, response.context.get('page_obj'))
+
+    def test_new_post_lands_in_follower_timeline(self):
+        """Новый пост автора попадает в ленту подписчика"""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='Свежий пост', author=self.author)
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки лента подписчика очищается"""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertTrue(Timeline.objects.filter(user=self.user).exists())
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    def test_follow_state_is_idempotent(self):
+        """JSON-подписка повторяется без ошибок и возвращает счётчики"""
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        url = reverse('posts:follow_state', args=(self.author.username,))
+        for _ in range(2):
+            response = self.authorized_client.post(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertEqual(response.json(), {
+                'following': True,
+                'followers_count': 1,
+                'following_count': 0,
+            })
+        self.assertEqual(Follow.objects.filter(
+            user=self.user, author=self.author).count(), 1)
+        for _ in range(2):
+            response = self.authorized_client.delete(url)
+            self.assertEqual(response.json(), {
+                'following': False,
+                'followers_count': 0,
+                'following_count': 0,
+            })
+        self.assertFalse(Follow.objects.filter(
+            user=self.user, author=self.author).exists())
+
+    def test_follow_state_skips_feed(self):
+        """JSON-подписка не перенаправляет на ленту и не читает её"""
+        url = reverse('posts:follow_state', args=(self.author.username,))
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.post(url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertFalse(any(
+            'posts_timeline' in query['sql'] and 'ORDER BY' in query['sql']
+            for query in context.captured_queries))
+
+    def test_profile_button_uses_follow_state(self):
+        """Кнопка на профиле ходит в JSON-адрес, старый оставлен запасным"""
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertContains(response, 'data-url="{}"'.format(
+            reverse('posts:follow_state', args=(self.author.username,))))
+        self.assertContains(response, 'href="{}"'.format(
+            reverse('posts:profile_follow', args=(self.author.username,))))
+
+    def test_follow_state_rejects_bad_requests(self):
+        """Аноним, подписка на себя и GET получают ошибку"""
+        url = reverse('posts:follow_state', args=(self.author.username,))
+        self.assertEqual(
+            self.client.post(url).status_code, HTTPStatus.UNAUTHORIZED)
+        self.assertEqual(
+            self.authorized_client.get(url).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED)
+        self_url = reverse('posts:follow_state', args=(self.user.username,))
+        self.assertEqual(
+            self.authorized_client.post(self_url).status_code,
+            HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Follow.objects.filter(
+            user=self.user, author=self.user).exists())
+
+    def test_rebuild_timeline_command(self):
+        """Команда rebuild_timeline восстанавливает ленты"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Timeline.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertTrue(Timeline.objects.filter(
+            user=self.user, post=self.post).exists())
+
+
+@override_settings(SUGGESTION_WORKERS=0)
+class SuggestionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.friend = User.objects.create_user(username='friend')
+        cls.popular = User.objects.create_user(username='popular')
+        cls.niche = User.objects.create_user(username='niche')
+        cls.neighbour = User.objects.create_user(username='neighbour')
+        cls.group = Group.objects.create(
+            title='Соседи', slug='neighbours', description='Группа')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        # TestCase не коммитит, так что пересчёт запускаем сразу.
+        patcher = mock.patch.object(
+            suggestions.transaction, 'on_commit', lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def candidates(self, user):
+        return list(Suggestion.objects.filter(user=user).values_list(
+            'candidate__username', flat=True))
+
+    def test_second_degree_and_co_posting(self):
+        """Подсказки — друзья друзей и соавторы по группам"""
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.popular)
+        Follow.objects.create(user=self.friend, author=self.niche)
+        Follow.objects.create(user=self.niche, author=self.popular)
+        Post.objects.create(
+            text='Пост соседа', author=self.neighbour, group=self.group)
+        Post.objects.create(
+            text='Пост читателя', author=self.reader, group=self.group)
+        self.assertEqual(
+            self.candidates(self.reader), ['popular', 'niche', 'neighbour'])
+
+    def test_follow_updates_followers_suggestions(self):
+        """Подписка пересчитывает подсказки и у подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.friend)
+        self.assertEqual(self.candidates(self.reader), [])
+        Follow.objects.create(user=self.friend, author=self.popular)
+        self.assertEqual(self.candidates(self.reader), ['popular'])
+        Follow.objects.create(user=self.reader, author=self.popular)
+        self.assertEqual(self.candidates(self.reader), [])
+
+    def test_pages_show_suggestions_in_one_query(self):
+        """Подсказки на страницах берутся одним запросом"""
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.popular)
+        with self.assertNumQueries(1):
+            shown = suggestions.for_user(self.reader)
+            self.assertEqual(shown[0].candidate.username, 'popular')
+        for url in (
+                reverse('posts:follow_index'),
+                reverse('posts:profile', args=(self.friend.username,))):
+            response = self.client.get(url)
+            self.assertContains(response, 'На кого подписаться')
+            self.assertContains(response, reverse(
+                'posts:profile', args=(self.popular.username,)))
+
+    def test_refresh_changes_profile_etag(self):
+        """Пересчёт подсказок меняет ETag профиля у этого читателя"""
+        url = reverse('posts:profile', args=(self.neighbour.username,))
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        suggestions.refresh([self.reader.pk])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_refresh_batches_users(self):
+        """Пересчёт пачки стоит столько же запросов, сколько одного"""
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.niche, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.popular)
+        with CaptureQueriesContext(connection) as single:
+            suggestions.refresh([self.reader.pk])
+        with CaptureQueriesContext(connection) as batch:
+            suggestions.refresh([self.reader.pk, self.niche.pk,
+                                 self.friend.pk, self.neighbour.pk])
+        self.assertEqual(len(batch), len(single))
+        self.assertEqual(self.candidates(self.niche), ['popular'])
+
+    def test_rebuild_suggestions_command(self):
+        """Команда rebuild_suggestions восстанавливает подсказки"""
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.popular)
+        Suggestion.objects.all().delete()
+        call_command('rebuild_suggestions', stdout=StringIO())
+        self.assertEqual(self.candidates(self.reader), ['popular'])
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='trend-author')
+        cls.quiet = Group.objects.create(
+            title='Тихая', slug='quiet', description='Группа')
+        cls.busy = Group.objects.create(
+            title='Шумная', slug='busy', description='Группа')
+        cls.old = Post.objects.create(
+            text='Обсуждаемый', author=cls.author, group=cls.busy)
+        cls.new = Post.objects.create(
+            text='Свежий', author=cls.author, group=cls.quiet)
+        for _ in range(3):
+            Comment.objects.create(
+                text='Комментарий', post=cls.old, author=cls.author)
+
+    def test_events_update_scores(self):
+        """Комментарии поднимают пост и его группу"""
+        self.assertEqual(trending.top_posts(), [self.old, self.new])
+        self.assertEqual(trending.top_groups(), [self.busy, self.quiet])
+
+    def test_older_events_decay(self):
+        """Событие двумя периодами полураспада раньше весит вчетверо меньше"""
+        now = timezone.now()
+        started = trending.epoch()
+        past = now - timedelta(hours=2 * TRENDING_HALF_LIFE_HOURS)
+        self.assertAlmostEqual(
+            trending.weight(1, past, started) * 4,
+            trending.weight(1, now, started))
+        self.assertAlmostEqual(trending.current(
+            trending.weight(1, past, started), started, now), 0.25)
+
+    def test_compact_keeps_order_and_prunes(self):
+        """Уплотнение сохраняет порядок и выбрасывает остывшее"""
+        before = trending.top_posts()
+        trending.compact(
+            timezone.now() + timedelta(hours=TRENDING_HALF_LIFE_HOURS))
+        self.assertEqual(trending.top_posts(), before)
+        self.assertAlmostEqual(
+            TrendingPost.objects.get(pk=self.new.pk).score, 0.5, places=3)
+        trending.compact(timezone.now() + timedelta(days=30))
+        self.assertFalse(TrendingPost.objects.exists())
+        self.assertFalse(TrendingGroup.objects.exists())
+
+    def test_compact_during_record_keeps_weight(self):
+        """Уплотнение посреди записи события не раздувает счёт"""
+        moment = timezone.now()
+        TrendingPost.objects.all().delete()
+        TrendingEpoch.objects.update(
+            started=moment - timedelta(hours=10 * TRENDING_HALF_LIFE_HOURS))
+        add = trending._add
+        calls = []
+
+        def compact_then_add(*args):
+            if not calls:
+                trending.compact(moment)
+            calls.append(args)
+            add(*args)
+
+        with mock.patch.object(trending, '_add', compact_then_add):
+            trending.record(self.new.pk, None, 1, moment)
+        self.assertAlmostEqual(
+            TrendingPost.objects.get(pk=self.new.pk).score, 1)
+
+    def test_rebuild_matches_incremental(self):
+        """Пересчёт с нуля даёт тот же порядок, что и события"""
+        TrendingPost.objects.all().delete()
+        TrendingGroup.objects.all().delete()
+        TrendingEpoch.objects.all().delete()
+        call_command('compact_trending', '--rebuild', stdout=StringIO())
+        self.assertEqual(trending.top_posts(), [self.old, self.new])
+        self.assertEqual(trending.top_groups(), [self.busy, self.quiet])
+
+    def test_page_reads_top_k(self):
+        """Страница популярного читает по одному запросу на вид"""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(response.context['posts'], [self.old, self.new])
+        self.assertContains(response, self.busy.title)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.author = User.objects.create_user(username='counted')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики обновляются при создании и удалении записей"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(text='Комментарий', post=post, author=self.user)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        post.refresh_from_db()
+        author, user = self.author.profile, self.user.profile
+        author.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(user.following_count, 1)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        post.delete()
+        author.refresh_from_db()
+        self.assertEqual(author.posts_count, 0)
+        self.assertEqual(author.followers_count, 0)
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters исправляет расхождения"""
+        Post.objects.create(text='Пост', author=self.author)
+        Profile.objects.filter(user=self.author).update(posts_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(
+            Profile.objects.get(user=self.author).posts_count, 1)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cached')
+        cls.group = Group.objects.create(
+            title='test title',
+            slug='test-slug-cached',
+            description='test'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn(f'post:{self.post.pk}', response['Surrogate-Key'])
+
+    def test_hits_and_misses_are_counted(self):
+        """Промахи и попадания в кэш страниц видны в метриках"""
+        events.clear()
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.assertEqual(
+            events.snapshot(), {'page_cache_misses': 1})
+        self.client.get(url)
+        admin = User.objects.create_superuser(
+            'cache-admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.assertEqual(
+            self.client.get(reverse('event_stats')).json(),
+            {'page_cache_hits': 1, 'page_cache_misses': 1})
+
+    def test_purge_touches_only_tagged_pages(self):
+        """Изменения сбрасывают только страницы с нужными ключами"""
+        detail = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.client.get(detail)
+        self.client.get(group)
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.user)
+        self.assertEqual(self.client.get(detail)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(group)['X-Cache'], 'HIT')
+        Post.objects.create(text='Другой пост', author=self.user)
+        self.assertEqual(self.client.get(group)['X-Cache'], 'HIT')
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(self.client.get(group)['X-Cache'], 'MISS')
+
+    def test_junk_query_shares_cache_entry(self):
+        """Посторонние параметры и битый курсор не создают новых записей"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        for junk in ({'utm': 'x'}, {'cursor': 'broken'}, {'page': 'abc'},
+                     {'cursor': ''}):
+            with self.subTest(junk=junk):
+                self.assertEqual(
+                    self.client.get(url, junk)['X-Cache'], 'HIT')
+        self.assertEqual(
+            self.client.get(url, {'page': '1'})['X-Cache'], 'MISS')
+
+    def test_purge_during_render_skips_cache(self):
+        """Страница, сброшенная во время рендера, не попадает в кэш"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        render = views.render
+
+        def render_and_purge(*args, **kwargs):
+            response = render(*args, **kwargs)
+            purge(f'group:{self.group.pk}')
+            return response
+
+        with mock.patch.object(views, 'render', render_and_purge):
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_only_visible_user_fields_reset_feed(self):
+        """Ленту сбрасывают только поля пользователя, видные в ней"""
+        generation = feed_generation()
+        self.user.email = 'cached@example.com'
+        self.user.save()
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(feed_generation(), generation)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertNotEqual(feed_generation(), generation)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы авторизованных пользователей не кэшируются"""
+        client = Client()
+        client.force_login(self.user)
+        client.get(reverse('posts:index'))
+        response = client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('X-Cache'))
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='etag')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified(self):
+        """Неизменившиеся страницы отдаются ответом 304"""
+        pages = {
+            reverse('posts:index'): 0,
+            reverse('posts:profile', kwargs={'username': self.user}): 1,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                0,
+        }
+        for page, queries in pages.items():
+            with self.subTest(page=page):
+                etag = self.client.get(page)['ETag']
+                with self.assertNumQueries(queries):
+                    response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_changes_with_data(self):
+        """ETag меняется после изменения данных"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_unknown_profile_has_no_etag(self):
+        """Профиль несуществующего автора не отвечает 304"""
+        url = reverse('posts:profile', kwargs={'username': 'nobody'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.best = Post.objects.create(
+            text='Котики котики котики', author=cls.user)
+        cls.other = Post.objects.create(
+            text='Про котиков и собак', author=cls.user)
+        Post.objects.create(text='Только собаки', author=cls.user)
+
+    def test_search_ranks_matches(self):
+        """Поиск находит посты и ранжирует их по BM25"""
+        response = self.client.get(reverse('posts:search'), {'q': 'котик'})
+        self.assertEqual(
+            list(response.context['page_obj']), [self.best, self.other])
+
+    def test_search_follows_text_changes(self):
+        """Индекс поиска следует за изменением текста поста"""
+        Post.objects.filter(pk=self.other.pk).update(text='Про собак')
+        response = self.client.get(reverse('posts:search'), {'q': 'котик'})
+        self.assertEqual(list(response.context['page_obj']), [self.best])
+
+    def test_search_pages(self):
+        """Результаты поиска листаются курсором"""
+        first = search_posts('котик', per_page=1)
+        self.assertEqual(list(first), [self.best])
+        second = search_posts('котик', first.next_cursor, per_page=1)
+        self.assertEqual(list(second), [self.other])
+        self.assertIsNone(second.next_cursor)
+
+    def test_search_ignores_fts_syntax(self):
+        """Операторы FTS5 в запросе не ломают поиск"""
+        for query in ('"', 'NEAR(', '*', 'котик OR', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по полнотекстовому индексу"""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class TypeaheadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='zebra_reader')
+        cls.group = Group.objects.create(
+            title='Зебры', slug='zebra-fans', description='test')
+
+    def setUp(self):
+        typeahead.invalidate()
+        typeahead.ensure_built()
+
+    def test_typeahead_finds_users_and_groups(self):
+        """Подсказки находят пользователей и группы по префиксу"""
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('posts:typeahead'), {'q': 'ZEB'})
+        data = response.json()
+        self.assertEqual(
+            [user['username'] for user in data['users']], ['zebra_reader'])
+        self.assertEqual(
+            [group['slug'] for group in data['groups']], ['zebra-fans'])
+
+    def test_typeahead_follows_saves(self):
+        """Подсказки обновляются при сохранении и удалении"""
+        with mock.patch.object(
+                signals.transaction, 'on_commit', lambda func: func()):
+            self.group.slug = 'zebra-club'
+            self.group.save()
+            self.assertEqual(
+                [group['slug']
+                 for group in typeahead.search('zebra')['groups']],
+                ['zebra-club'])
+            self.group.delete()
+        self.assertEqual(typeahead.search('zebra')['groups'], [])
+
+    def test_rolled_back_save_is_not_indexed(self):
+        """Откаченное сохранение не попадает в подсказки"""
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            User.objects.create_user(username='zebra_phantom')
+            raise RuntimeError
+        self.assertEqual(
+            [user['username'] for user in typeahead.search('zebra')['users']],
+            ['zebra_reader'])
+
+    def test_build_keeps_changes_made_during_build(self):
+        """Изменения во время пересборки не теряются"""
+        payload = typeahead_module.group_payload
+
+        def group_payload(slug, title):
+            typeahead.add_user(self.user.pk + 1000, 'zebra_late')
+            return payload(slug, title)
+
+        typeahead.invalidate()
+        with mock.patch.object(
+                typeahead_module, 'group_payload', group_payload):
+            typeahead.ensure_built()
+        self.assertIn(
+            'zebra_late',
+            [user['username'] for user in typeahead.search('zebra')['users']])
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commented')
+        cls.post = Post.objects.create(text='Тестовый текст', author=cls.user)
+        for i in range(COMMENTS_PER_PAGE + VIEWS_TEST_FOR_SECOND_PAGE):
+            Comment.objects.create(
+                text=f'Комментарий {i}',
+                post=cls.post,
+                author=User.objects.create_user(username=f'commenter{i}')
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_comments_in_one_query(self):
+        """Первая страница комментариев читается одним запросом"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertContains(response, 'data-comments-more')
+
+    def test_comments_fragment_continues_by_cursor(self):
+        """Фрагмент отдаёт следующие комментарии по курсору"""
+        detail = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}))
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': detail.context['comments'].next_cursor}
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), VIEWS_TEST_FOR_SECOND_PAGE)
+        self.assertEqual(comments[0].text, f'Комментарий {COMMENTS_PER_PAGE}')
+        self.assertNotContains(response, 'data-comments-more')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter')
+        author = User.objects.create_user(username='followed')
+        cls.post = Post.objects.create(
+            text='Пост для выгрузки',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='export.gif', content=b'GIF89a', content_type='image/gif')
+        )
+        Comment.objects.create(
+            text='Комментарий', post=cls.post, author=cls.user)
+        Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_ndjson_export_streams_all_records(self):
+        """Выгрузка в NDJSON содержит посты, комментарии и подписки"""
+        response = self.client.get(reverse('posts:export'))
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = [
+            json.loads(line)
+            for line in self.read(response).decode().splitlines()
+        ]
+        self.assertEqual(
+            [row['type'] for row in rows], ['post', 'comment', 'follow'])
+        self.assertEqual(rows[2]['author'], 'followed')
+
+    def test_csv_export(self):
+        """Выгрузка в CSV начинается с заголовка"""
+        response = self.client.get(reverse('posts:export'), {'format': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(self.read(response).decode())))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['text'], self.post.text)
+
+    def test_zip_export_bundles_images(self):
+        """Архив содержит выгрузку и картинки постов"""
+        response = self.client.get(reverse('posts:export'), {'images': '1'})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(self.read(response)))
+        self.assertEqual(archive.namelist(), [
+            'exporter.ndjson', f'images/{self.post.image.name}'])
+        self.assertEqual(
+            archive.read(f'images/{self.post.image.name}'), b'GIF89a')
+
+    def test_export_command(self):
+        """Команда пишет ту же выгрузку в stdout"""
+        out = StringIO()
+        call_command('export_user', 'exporter', '--format=csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+    def test_export_requires_login(self):
+        """Выгрузка доступна только вошедшим пользователям"""
+        response = Client().get(reverse('posts:export'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        os.mkdir(os.path.join(self.directory, 'posts'))
+        with open(os.path.join(self.directory, 'posts', 'a.gif'), 'wb') as f:
+            f.write(b'GIF89a')
+        self.reader = User.objects.create_user(username='reader')
+        records = [
+            {'type': 'follow', 'user': 'reader', 'author': 'migrated'},
+            {'type': 'post', 'id': 7, 'author': 'migrated',
+             'group': 'imported', 'text': 'Старый пост',
+             'created': '2015-06-01T10:00:00+00:00',
+             'image': 'posts/a.gif'},
+            {'type': 'post', 'id': 8, 'text': 'Без автора'},
+            {'type': 'comment', 'post': 7, 'author': 'reader',
+             'text': 'Импортированный комментарий'},
+            'не json',
+        ]
+        self.path = os.path.join(self.directory, 'dump.ndjson')
+        with open(self.path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command(
+            'import_posts', self.path, '--chunk-size=2',
+            f'--images-dir={self.directory}', '--user=migrated',
+            *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_writes_records_and_derived_state(self):
+        """Импорт создаёт записи, ленты и счётчики без сигналов"""
+        output = self.run_import()
+        self.assertIn('записей/с', output)
+        author = User.objects.get(username='migrated')
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group.slug, 'imported')
+        self.assertEqual(post.image.read(), b'GIF89a')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author.posts.count(), 2)
+        self.assertEqual(author.profile.posts_count, 2)
+        self.assertEqual(author.profile.followers_count, 1)
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(), 2)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск не дублирует импортированное"""
+        self.run_import()
+        self.run_import()
+        self.assertEqual(Post.objects.count(), 2)
+        self.run_import('--restart')
+        self.assertEqual(Post.objects.count(), 4)
+
+    def test_failed_chunk_is_retried_whole(self):
+        """Пачка и отметка о ней фиксируются вместе"""
+        import_comments = Importer.import_comments
+
+        def fail_on_comments(importer, records):
+            import_comments(importer, records)
+            if records:
+                raise RuntimeError
+
+        with mock.patch.object(
+                Importer, 'import_comments', fail_on_comments):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+        self.assertEqual(Post.objects.count(), 1)
+        self.run_import()
+        self.assertEqual(Post.objects.count(), 2)
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(
+            post.comments.get().text, 'Импортированный комментарий')
+
+    def test_image_outside_images_dir_is_ignored(self):
+        """Картинки вне каталога выгрузки не копируются"""
+        importer = Importer(None, images_dir=os.path.join(
+            self.directory, 'posts'))
+        for name in ('../dump.ndjson', self.path, 'missing.gif'):
+            with self.subTest(name=name):
+                self.assertEqual(importer.copy_image(name), '')
+
+    def test_insert_keeps_explicit_dates(self):
+        """Заданные даты пишутся как есть, поле модели не меняется"""
+        author = User.objects.create_user(username='dated')
+        field = Post._meta.get_field('pub_date')
+        insert = bulk._insert
+
+        def check_field(*args, **kwargs):
+            self.assertTrue(field.auto_now_add)
+            return insert(*args, **kwargs)
+
+        old = timezone.now() - timedelta(days=400)
+        with mock.patch.object(bulk, '_insert', check_field):
+            with transaction.atomic():
+                dated, undated = bulk.insert(Post, [
+                    Post(text='Старый', author=author, pub_date=old),
+                    Post(text='Без даты', author=author),
+                ], dates=('pub_date',))
+        self.assertEqual(Post.objects.get(pk=dated.pk).pub_date, old)
+        self.assertGreater(
+            Post.objects.get(pk=undated.pk).pub_date, old)
+
+    def test_reserved_pks_are_not_reused(self):
+        """Пачка не получает id удалённых постов"""
+        author = User.objects.create_user(username='bulk')
+        deleted = Post.objects.create(text='Удалённый', author=author).pk
+        Post.objects.filter(pk=deleted).delete()
+        posts = bulk.insert(Post, [Post(text='Новый', author=author)])
+        self.assertGreater(posts[0].pk, deleted)
+        self.assertGreater(
+            Post.objects.create(text='Ещё', author=author).pk, posts[0].pk)
+
+
+class GenerateDatasetTest(TestCase):
+    def generate(self, seed=1, *args):
+        call_command(
+            'generate_dataset', '--users=30', '--groups=3', '--posts=200',
+            '--comments=300', '--follows-per-user=5', '--chunk-size=64',
+            f'--seed={seed}', *args, stdout=StringIO())
+
+    def test_dataset_shape(self):
+        """Генератор создаёт связанные данные с перекосом популярности"""
+        users, groups = User.objects.count(), Group.objects.count()
+        posts, comments = Post.objects.count(), Comment.objects.count()
+        self.generate()
+        self.assertEqual(User.objects.count(), users + 30)
+        self.assertEqual(Group.objects.count(), groups + 3)
+        self.assertEqual(Post.objects.count(), posts + 200)
+        self.assertEqual(Comment.objects.count(), comments + 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Comment.objects.filter(
+            created__lt=models.F('post__pub_date')).exists())
+        top = Post.objects.order_by('-comments_count').first()
+        self.assertGreater(top.comments_count, 300 / 200 * 5)
+        follower = Follow.objects.first().user
+        self.assertEqual(
+            Timeline.objects.filter(user=follower).count(),
+            Post.objects.filter(author__following__user=follower).count())
+        self.assertEqual(
+            Profile.objects.get(user=top.author).posts_count,
+            top.author.posts.count())
+
+    def test_seed_reproduces_dataset(self):
+        """Один и тот же seed даёт один и тот же набор"""
+        self.generate(seed=7)
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date'))[:20]
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.generate(seed=7)
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date'))[:20]
+        self.assertEqual(first, second)
+
+    def test_dates_end_at_anchor(self):
+        """Даты набора отсчитываются назад от заданной даты"""
+        self.generate(1, '--anchor=2020-06-01', '--days=10')
+        anchor = datetime(2020, 6, 1, tzinfo=timezone.utc)
+        self.assertFalse(Post.objects.filter(pub_date__gt=anchor).exists())
+        self.assertFalse(Post.objects.filter(
+            pub_date__lt=anchor - timedelta(days=10)).exists())
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='bench-author')
+        reader = User.objects.create_user(username='bench-reader')
+        group = Group.objects.create(
+            title='Замеры', slug='bench', description='Группа')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Comment.objects.create(text='Комментарий', post=post, author=reader)
+        Follow.objects.create(user=reader, author=author)
+
+    def test_run_measures_every_view(self):
+        """Замер проходит по всем страницам и считает запросы"""
+        results = benchmark.run(iterations=2, warmup=0)
+        self.assertEqual(set(results), set(benchmark.VIEWS))
+        self.assertEqual(results['follow_index']['queries'], 4)
+        self.assertIn('p99_ms', results['index'])
+        self.assertGreater(results['index']['sql_ms'], 0)
+
+    def test_compare_flags_regressions(self):
+        """Рост времени сверх порога и любой рост числа запросов — регрессия"""
+        reference = {'p50_ms': 10.0, 'sql_ms': 2.0, 'queries': 2}
+        baseline = {'index': reference}
+        self.assertEqual(benchmark.compare(
+            {'index': dict(reference, p50_ms=12.0)}, baseline, 0.5), [])
+        self.assertEqual(len(benchmark.compare(
+            {'index': dict(reference, p50_ms=16.0, queries=3)},
+            baseline, 0.5)), 2)
+        self.assertEqual(benchmark.compare(
+            {'index': dict(reference, sql_ms=2.9)}, baseline, 0.1), [])
+        self.assertEqual(benchmark.compare(
+            {'index': dict(reference, p50_ms=16.0)}, baseline, 0.5,
+            scale=2.0), [])
+
+
+class IndexAdvisorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='plan-author')
+        reader = User.objects.create_user(username='plan-reader')
+        group = Group.objects.create(
+            title='Планы', slug='plans', description='Группа')
+        post = Post.objects.create(text='Пост', author=author, group=group)
+        Comment.objects.create(text='Комментарий', post=post, author=reader)
+        Follow.objects.create(user=reader, author=author)
+
+    def test_problems_flags_scans_and_temp_sorts(self):
+        """Полный просмотр и временная сортировка попадают в отчёт"""
+        self.assertEqual(advisor.problems([
+            '2 0 0 SCAN posts_post',
+            '9 0 0 USE TEMP B-TREE FOR ORDER BY',
+        ]), [
+            'полный просмотр posts_post',
+            'временная сортировка для ORDER BY',
+        ])
+        self.assertEqual(advisor.problems([
+            '7 0 0 SCAN posts_post USING INDEX posts_post_pub_date',
+            '3 0 0 SCAN CONSTANT ROW',
+            '4 0 0 SEARCH posts_post USING INDEX post_author_pub_date_idx',
+        ]), [])
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты автора и группы читаются по составным индексам"""
+        report = advisor.advise(benchmark.targets())
+        self.assertEqual(set(report), set(benchmark.VIEWS))
+        for name, queries in report.items():
+            for query in queries:
+                self.assertEqual(query['problems'], [], query['plan'])
+        plans = ' '.join(
+            line for name in ('group_list', 'profile')
+            for query in report[name] for line in query['plan'])
+        self.assertIn('post_group_pub_date_idx', plans)
+        self.assertIn('post_author_pub_date_idx', plans)
+
+    def test_command_reports_current_database(self):
+        """Команда проверяет рабочую базу и печатает итог"""
+        out = StringIO()
+        call_command('index_advisor', '--current', '--strict', stdout=out)
+        self.assertIn('Проблем не найдено', out.getvalue())
@@ -0,0 +1,196 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    KVStore as CachedDBKVStore)
+
+from core.background import BackgroundPool
+from core.timing import phase
+
+from .caching import purge
+from .constants import THUMBNAIL_GEOMETRIES
+
+logger = logging.getLogger(__name__)
+
+pool = BackgroundPool('THUMBNAIL_WORKERS', 'thumbnail')
+_worker = threading.local()
+
+
+def _generate(name, geometry, options, post_pk):
+    _worker.active = True
+    try:
+        default.backend.get_thumbnail(name, geometry, **options)
+        # Страницы, отрисованные с исходной картинкой, больше не нужны.
+        if post_pk is not None:
+            purge(f'post:{post_pk}')
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        _worker.active = False
+        pool.release([(name, geometry)])
+
+
+def _submit(name, geometry, options, post_pk):
+    if pool.claim([(name, geometry)]):
+        pool.run(_generate, name, geometry, options, post_pk)
+
+
+def queue_thumbnail(name, geometry, post_pk=None, **options):
+    """Ставит миниатюру в очередь фонового пула после коммита.
+
+    Когда известен ``post_pk``, готовая миниатюра сбрасывает закэшированные
+    страницы этого поста. При ``THUMBNAIL_WORKERS = 0`` миниатюра
+    создаётся сразу в том же потоке.
+    """
+    transaction.on_commit(lambda: _submit(name, geometry, options, post_pk))
+
+
+def pregenerate(image, post_pk=None):
+    """Заранее создаёт миниатюры всех размеров, которые выводит сайт."""
+    if not image:
+        return
+    for geometry, options in THUMBNAIL_GEOMETRIES:
+        queue_thumbnail(image.name, geometry, post_pk, **options)
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Не создаёт миниатюры внутри запроса.
+
+    Если миниатюры ещё нет в хранилище ключей, её создание уходит
+    в фоновый пул, а шаблон получает исходную картинку.
+    """
+
+    def _prepare_options(self, source, options):
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if getattr(_worker, 'active', False) or not file_:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        with phase('thumbnail'):
+            return self._lookup(file_, geometry_string, options)
+
+    def _lookup(self, file_, geometry_string, options):
+        source = ImageFile(file_)
+        prepared = self._prepare_options(source, dict(options))
+        name = self._get_thumbnail_filename(
+            source, geometry_string, prepared)
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+        queue_thumbnail(source.name, geometry_string, **options)
+        return source
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш ограниченного размера со статистикой."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+kvstore_lru = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+
+
+class LRUKVStore(CachedDBKVStore):
+    """Хранилище ключей sorl с LRU-кэшем в памяти процесса.
+
+    Запоминаются только найденные значения: отсутствие миниатюры
+    быстро становится неправдой, когда её дорисует фоновый пул.
+    """
+
+    def _get_raw(self, key):
+        value = kvstore_lru.get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                kvstore_lru.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        kvstore_lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        kvstore_lru.delete(*keys)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        kvstore_lru.clear()
+
+
+def evict_image(name):
+    """Выбрасывает из LRU записи о картинке и её миниатюрах."""
+    if not name:
+        return
+    key = ImageFile(name, default.storage).key
+    thumbnails_key = add_prefix(key, 'thumbnails')
+    keys = [add_prefix(key), thumbnails_key]
+    thumbnails = kvstore_lru.peek(thumbnails_key)
+    if thumbnails:
+        keys.extend(add_prefix(thumbnail) for thumbnail in deserialize(
+            thumbnails))
+    kvstore_lru.delete(*keys)
@@ -0,0 +1,58 @@
+from .models import Follow, Post, Timeline
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_many(posts):
+    """Раскладывает пачку постов в ленты подписчиков их авторов."""
+    followers = {}
+    for user_id, author_id in Follow.objects.filter(
+            author_id__in={post.author_id for post in posts}
+    ).values_list('user_id', 'author_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+            for post in posts
+            for user_id in followers.get(post.author_id, ())
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts.iterator()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild():
+    """Пересобирает все ленты по текущим подпискам."""
+    Timeline.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
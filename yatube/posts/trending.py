@@ -0,0 +1,167 @@
+import heapq
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .constants import (
+    FEED_DEFERRED_FIELDS, TRENDING_CAPACITY, TRENDING_COMMENT_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS, TRENDING_MIN_SCORE, TRENDING_POST_WEIGHT,
+    TRENDING_SIZE, TRENDING_WINDOW_DAYS)
+from .models import (
+    Comment, Post, TrendingEpoch, TrendingGroup, TrendingPost)
+
+DECAY = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 60 * 60)
+# До переполнения float остаётся около тысячи периодов полураспада;
+# если уплотнение давно не запускалось, его делает очередное событие.
+REBASE_AFTER = timedelta(hours=TRENDING_HALF_LIFE_HOURS * 100)
+
+
+def epoch():
+    return TrendingEpoch.objects.get_or_create(
+        pk=1, defaults={'started': timezone.now()})[0].started
+
+
+def weight(value, moment, started):
+    """Вес события с прямым затуханием.
+
+    Вместо того чтобы уменьшать все счета со временем, каждое событие
+    весит ``value * exp(DECAY * (moment - started))``: более поздние
+    события весят больше. Порядок по сохранённому счёту совпадает с
+    порядком по затухшему, поэтому для выдачи хватает индекса по счёту.
+    """
+    return value * math.exp(DECAY * (moment - started).total_seconds())
+
+
+def current(score, started, now=None):
+    """Затухший счёт на момент ``now``, в весах самих событий."""
+    now = now or timezone.now()
+    return score * math.exp(-DECAY * (now - started).total_seconds())
+
+
+def _add(model, pk, value):
+    """Атомарно прибавляет к счёту, создавая строку при первом событии."""
+    if model.objects.filter(pk=pk).update(score=F('score') + value):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(pk=pk, score=value)
+    except IntegrityError:
+        model.objects.filter(pk=pk).update(score=F('score') + value)
+
+
+def record(post_id, group_id, value, moment=None):
+    """Учитывает событие поста: публикацию или комментарий.
+
+    Точка отсчёта перечитывается после записи, в той же транзакции:
+    если между чтением и прибавлением прошло уплотнение, прибавленный
+    по старой точке вес поправляется до веса по новой.
+    """
+    moment = moment or timezone.now()
+    with transaction.atomic():
+        started = epoch()
+        if moment - started > REBASE_AFTER:
+            started = compact(moment)
+        weighted = weight(value, moment, started)
+        _add(TrendingPost, post_id, weighted)
+        if group_id:
+            _add(TrendingGroup, group_id, weighted)
+        latest = epoch()
+        if latest != started:
+            correction = weight(value, moment, latest) - weighted
+            _add(TrendingPost, post_id, correction)
+            if group_id:
+                _add(TrendingGroup, group_id, correction)
+
+
+def post_published(post):
+    record(post.pk, post.group_id, TRENDING_POST_WEIGHT, post.pub_date)
+
+
+def comment_added(comment):
+    record(
+        comment.post_id, comment.post.group_id, TRENDING_COMMENT_WEIGHT,
+        comment.created)
+
+
+def _prune(model):
+    model.objects.filter(score__lt=TRENDING_MIN_SCORE).delete()
+    kept = model.objects.order_by('-score').values('pk')[:TRENDING_CAPACITY]
+    model.objects.exclude(pk__in=kept).delete()
+
+
+def compact(now=None):
+    """Переносит точку отсчёта на ``now`` и выбрасывает остывшее.
+
+    Все счета умножаются на одно и то же затухание, так что порядок
+    не меняется, а числа остаются небольшими. Оставляются не больше
+    ``TRENDING_CAPACITY`` лучших строк каждого вида.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        state, _ = TrendingEpoch.objects.get_or_create(
+            pk=1, defaults={'started': now})
+        factor = math.exp(-DECAY * (now - state.started).total_seconds())
+        for model in (TrendingPost, TrendingGroup):
+            model.objects.update(score=F('score') * factor)
+            _prune(model)
+        state.started = now
+        state.save(update_fields=['started'])
+    return now
+
+
+def rebuild(now=None):
+    """Пересчитывает счета по постам и комментариям за последние дни.
+
+    Нужен после пакетной загрузки, которая не отправляет сигналы.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+    posts, groups = defaultdict(float), defaultdict(float)
+    events = (
+        (TRENDING_POST_WEIGHT, Post.objects.filter(
+            pub_date__gte=since).values_list('pk', 'group_id', 'pub_date')),
+        (TRENDING_COMMENT_WEIGHT, Comment.objects.filter(
+            created__gte=since).values_list(
+            'post_id', 'post__group_id', 'created')),
+    )
+    for value, rows in events:
+        for post_id, group_id, moment in rows.iterator():
+            weighted = weight(value, moment, now)
+            posts[post_id] += weighted
+            if group_id:
+                groups[group_id] += weighted
+    with transaction.atomic():
+        TrendingEpoch.objects.update_or_create(
+            pk=1, defaults={'started': now})
+        for model, field, scores in (
+                (TrendingPost, 'post_id', posts),
+                (TrendingGroup, 'group_id', groups)):
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                model(**{field: pk}, score=score)
+                for pk, score in heapq.nlargest(
+                    TRENDING_CAPACITY, scores.items(),
+                    key=lambda item: item[1])
+                if score >= TRENDING_MIN_SCORE
+            )
+    return len(posts), len(groups)
+
+
+def top_posts(limit=TRENDING_SIZE):
+    """Самые обсуждаемые сейчас посты: чтение ``limit`` строк по индексу."""
+    rows = TrendingPost.objects.select_related(
+        'post__author', 'post__group').defer(
+        *(f'post__{field}' for field in FEED_DEFERRED_FIELDS))[:limit]
+    return [row.post for row in rows]
+
+
+def top_groups(limit=TRENDING_SIZE):
+    return [
+        row.group for row in
+        TrendingGroup.objects.select_related('group').defer(
+            'group__description')[:limit]
+    ]
@@ -0,0 +1,148 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.urls import NoReverseMatch, reverse
+
+from .constants import TYPEAHEAD_LIMIT
+from .models import Group, User
+
+
+class PrefixIndex:
+    """Отсортированный список ключей для поиска по префиксу.
+
+    Поиск — двоичный поиск первого ключа с префиксом и проход вправо,
+    пока ключи начинаются с этого префикса.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def add(self, pk, key, payload):
+        key = key.lower()
+        with self._lock:
+            self._remove(pk)
+            insort(self._keys, (key, pk))
+            self._items[pk] = (key, payload)
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    def _remove(self, pk):
+        if pk not in self._items:
+            return
+        key, _ = self._items.pop(pk)
+        position = bisect_left(self._keys, (key, pk))
+        del self._keys[position]
+
+    def search(self, prefix, limit=TYPEAHEAD_LIMIT):
+        prefix = prefix.lower()
+        with self._lock:
+            position = bisect_left(self._keys, (prefix,))
+            found = []
+            for key, pk in self._keys[position:position + limit]:
+                if not key.startswith(prefix):
+                    break
+                found.append(self._items[pk][1])
+            return found
+
+
+class Typeahead:
+    """Индексы пользователей и групп, строятся при первом обращении.
+
+    Изменения, пришедшие во время сборки, записываются в журнал и
+    проигрываются на новых индексах перед подменой, чтобы сборка по
+    старому снимку базы их не потеряла.
+    """
+
+    def __init__(self):
+        self.users = PrefixIndex()
+        self.groups = PrefixIndex()
+        self._built = False
+        self._journal = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.RLock()
+
+    def _apply(self, index, method, *args):
+        with self._lock:
+            getattr(getattr(self, index), method)(*args)
+            if self._journal is not None:
+                self._journal.append((index, method, args))
+
+    def add_user(self, pk, username):
+        self._apply('users', 'add', pk, username, user_payload(username))
+
+    def remove_user(self, pk):
+        self._apply('users', 'remove', pk)
+
+    def add_group(self, pk, slug, title):
+        self._apply('groups', 'add', pk, slug, group_payload(slug, title))
+
+    def remove_group(self, pk):
+        self._apply('groups', 'remove', pk)
+
+    def build(self):
+        with self._build_lock:
+            with self._lock:
+                self._journal = []
+            try:
+                fresh = {'users': PrefixIndex(), 'groups': PrefixIndex()}
+                for pk, username in User.objects.values_list(
+                        'pk', 'username').iterator():
+                    fresh['users'].add(pk, username, user_payload(username))
+                for pk, slug, title in Group.objects.values_list(
+                        'pk', 'slug', 'title').iterator():
+                    fresh['groups'].add(
+                        pk, slug, group_payload(slug, title))
+                with self._lock:
+                    for index, method, args in self._journal:
+                        getattr(fresh[index], method)(*args)
+                    self.users, self.groups = fresh['users'], fresh['groups']
+                    self._built = True
+            finally:
+                with self._lock:
+                    self._journal = None
+
+    def ensure_built(self):
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self.build()
+
+    def invalidate(self):
+        """Пересобрать индексы при следующем поиске."""
+        self._built = False
+
+    def search(self, prefix):
+        self.ensure_built()
+        return {
+            'users': self.users.search(prefix),
+            'groups': self.groups.search(prefix),
+        }
+
+
+def _url(name, **kwargs):
+    try:
+        return reverse(name, kwargs=kwargs)
+    except NoReverseMatch:
+        return None
+
+
+def user_payload(username):
+    return {
+        'username': username,
+        'url': _url('posts:profile', username=username),
+    }
+
+
+def group_payload(slug, title):
+    return {
+        'slug': slug,
+        'title': title,
+        'url': _url('posts:group_list', slug=slug),
+    }
+
+
+typeahead = Typeahead()
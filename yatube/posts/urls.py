@@ -9,11 +9,20 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('search/', views.search, name='search'),
+    path('trending/', views.trending, name='trending'),
+    path('typeahead/', views.typeahead_search, name='typeahead'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('export/', views.export_data, name='export'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -24,4 +33,9 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/following/',
+        views.follow_state,
+        name='follow_state'
+    ),
 ]
@@ -1,10 +1,220 @@
-from django.core.paginator import Paginator
+import base64
+import json
 
-from .constants import NUMBER_OF_POSTS_PER_PAGE
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 
+from .constants import (
+    COMMENT_ORDERING, COMMENTS_PER_PAGE, CURSOR_ORDERING,
+    NUMBER_OF_POSTS_PER_PAGE)
 
-def paginator(request, obj_list):
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_token(payload):
+    """Упаковывает данные курсора в непрозрачную строку для URL."""
+    raw = json.dumps(payload)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token.encode())
+        return json.loads(raw.decode())
+    except (TypeError, ValueError) as error:
+        raise InvalidCursor(token) from error
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (keyset) без COUNT(*) и OFFSET.
+
+    Курсор кодирует значения полей сортировки последней (или первой)
+    записи страницы, следующая страница выбирается условием вида
+    ``(pub_date, id) < (значение, значение)`` по индексу.
+    """
+
+    def __init__(self, object_list, per_page, ordering=CURSOR_ORDERING):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def _fields(self):
+        return [
+            (key.lstrip('-'), key.startswith('-')) for key in self.ordering
+        ]
+
+    def _values(self, obj):
+        return [str(getattr(obj, name)) for name, _ in self._fields()]
+
+    def _field(self, name):
+        """Поле модели или аннотации, по которому идёт сортировка."""
+        opts = self.object_list.model._meta
+        if name == 'pk':
+            return opts.pk
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return opts.get_field(name)
+
+    def _parse(self, values):
+        return [
+            self._field(name).to_python(value)
+            for (name, _), value in zip(self._fields(), values)
+        ]
+
+    def encode_cursor(self, direction, obj):
+        return encode_token([direction, self._values(obj)])
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = decode_token(cursor)
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            if len(values) != len(self.ordering):
+                raise ValueError(values)
+            return direction, self._parse(values)
+        except (TypeError, ValueError, ValidationError) as error:
+            raise InvalidCursor(cursor) from error
+
+    def _seek(self, values, forward):
+        """Условие «строго после» (или «строго до») для ключа сортировки."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def seek(self, cursor=None):
+        """Записи после курсора плюс одна лишняя — признак продолжения.
+
+        Возвращает ленивую выборку, её удобно обходить ``iterator()``.
+        """
+        values = None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+            else:
+                if direction != 'next':
+                    values = None
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, True))
+        return queryset[:self.per_page + 1]
+
+    def cursor_page(self, cursor=None):
+        direction, values = 'next', None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+        return CursorPage(self, direction == 'next', values)
+
+
+class CursorPage(Page):
+    """Страница курсорного пагинатора.
+
+    Записи выбираются лениво, при первом обращении, поэтому страница,
+    отрисованная из кэша, не делает запросов к базе.
+    """
+
+    keyset = True
+
+    def __init__(self, paginator, forward, values):
+        self.paginator = paginator
+        self.number = None
+        self.forward = forward
+        self.values = values
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    @cached_property
+    def _fetched(self):
+        paginator = self.paginator
+        queryset = paginator.object_list
+        if self.values is not None:
+            queryset = queryset.filter(
+                paginator._seek(self.values, self.forward))
+        if not self.forward:
+            queryset = queryset.reverse()
+        rows = list(queryset[:paginator.per_page + 1])
+        has_more = len(rows) > paginator.per_page
+        rows = rows[:paginator.per_page]
+        if self.forward:
+            return rows, has_more, self.values is not None
+        rows.reverse()
+        return rows, True, has_more
+
+    @property
+    def object_list(self):
+        return self._fetched[0]
+
+    def has_next(self):
+        return self._fetched[1]
+
+    def has_previous(self):
+        return self._fetched[2]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return self.paginator.encode_cursor('next', self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return self.paginator.encode_cursor('prev', self.object_list[0])
+
+    def as_page(self):
+        """Та же страница в виде обычной ``Page``.
+
+        Для кода, который проверяет точный тип страницы. Номер условный:
+        1 — первая страница, 2 — перед ней есть записи; ``num_pages``
+        выставляется так, чтобы ``has_next()`` не считал ``COUNT(*)``.
+        """
+        rows, has_next, has_previous = self._fetched
+        number = 2 if has_previous else 1
+        self.paginator.num_pages = number + 1 if has_next else number
+        page = Page(rows, number, self.paginator)
+        page.keyset = True
+        page.next_cursor = self.next_cursor
+        page.previous_cursor = self.previous_cursor
+        return page
+
+
+def paginator(request, obj_list, keyset=False, ordering=CURSOR_ORDERING,
+              plain=False):
+    """Возвращает страницу списка.
+
+    При ``keyset=True`` используется курсорная пагинация по ``ordering``,
+    но старые ссылки вида ``?page=N`` по-прежнему открываются обычным
+    пагинатором. ``plain=True`` отдаёт курсорную страницу как ``Page``.
+    """
+    if keyset:
+        if 'page' not in request.GET:
+            page = CursorPaginator(
+                obj_list, NUMBER_OF_POSTS_PER_PAGE, ordering
+            ).cursor_page(request.GET.get('cursor'))
+            return page.as_page() if plain else page
+        obj_list = obj_list.order_by(*ordering)
     paginator = Paginator(obj_list, NUMBER_OF_POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def comments_page(comments, cursor=None):
+    """Страница комментариев по курсору ``(created, id)``."""
+    return CursorPaginator(
+        comments.select_related('author'), COMMENTS_PER_PAGE, COMMENT_ORDERING
+    ).cursor_page(cursor)
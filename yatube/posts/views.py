@@ -1,39 +1,66 @@
+from django.core.files.storage import default_storage
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
-
+from django.db import transaction
+from django.db.models import F
+from django.views.decorators.http import condition, require_http_methods
+
+from . import export, suggestions
+from .caching import (
+    cache_anonymous_page, feed_etag, feed_generation, post_etag, post_keys,
+    profile_etag)
+from .constants import FEED_CACHE_TIMEOUT, FOLLOW_CURSOR_ORDERING
 from .forms import PostForm, CommentForm
-from .models import Group, Post, Follow, User
-from .utils import paginator
+from .models import Comment, Group, Post, Follow, Profile, User
+from .search import search_posts
+from .thumbnails import pregenerate
+from .trending import top_groups, top_posts
+from .typeahead import typeahead
+from .utils import comments_page, paginator
 
 
+@condition(etag_func=feed_etag)
+@cache_anonymous_page
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('group')
-    page_obj = paginator(request, post_list)
+    post_list = Post.objects.for_feed()
+    page_obj = paginator(request, post_list, keyset=True)
     context = {
         'page_obj': page_obj,
+        'feed_generation': feed_generation(),
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
     }
+    response = render(request, template, context)
+    response.surrogate_keys = {'feed', *post_keys(page_obj)}
 
-    return render(request, template, context)
+    return response
 
 
+@condition(etag_func=feed_etag)
+@cache_anonymous_page
 def group_posts(request, slug):
     template = "posts/group_list.html"
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator(request, post_list)
+    post_list = group.posts.for_feed()
+    page_obj = paginator(request, post_list, keyset=True)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
+    response = render(request, template, context)
+    response.surrogate_keys = {f'group:{group.pk}', *post_keys(page_obj)}
 
-    return render(request, template, context)
+    return response
 
 
+@condition(etag_func=profile_etag)
+@cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = paginator(request, post_list)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    post_list = author.posts.for_feed()
+    page_obj = paginator(request, post_list, keyset=True)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -42,25 +69,86 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'suggestions': suggestions.for_user(request.user),
     }
+    response = render(request, 'posts/profile.html', context)
+    response.surrogate_keys = {f'author:{author.pk}', *post_keys(page_obj)}
 
-    return render(request, 'posts/profile.html', context)
+    return response
 
 
+@condition(etag_func=post_etag)
+@cache_anonymous_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__profile'),
+        pk=post_id
+    )
     form = CommentForm()
-    comments = post.comments.all()
+    comments = comments_page(post.comments.all())
     context = {
         'form': form,
         'post': post,
+        'post_id': post.pk,
+        'comments': comments,
+    }
+    response = render(request, 'posts/post_detail.html', context)
+    response.surrogate_keys = {
+        f'author:{post.author_id}', f'comments:{post.pk}',
+        *post_keys([post]),
+    }
+
+    return response
+
+
+@condition(etag_func=post_etag)
+@cache_anonymous_page
+def post_comments(request, post_id):
+    comments = comments_page(
+        Comment.objects.filter(post_id=post_id), request.GET.get('cursor'))
+    context = {
+        'post_id': post_id,
         'comments': comments,
     }
+    response = render(request, 'posts/includes/comment_list.html', context)
+    response.surrogate_keys = {
+        f'comments:{post_id}',
+        *(f'user:{comment.author_id}' for comment in comments),
+    }
+
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    page_obj = search_posts(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+
+    return render(request, 'posts/search.html', context)
+
+
+def trending(request):
+    context = {
+        'posts': top_posts(),
+        'groups': top_groups(),
+    }
+
+    return render(request, 'posts/trending.html', context)
+
 
-    return render(request, 'posts/post_detail.html', context)
+def typeahead_search(request):
+    prefix = request.GET.get('q', '').strip()
+    if not prefix:
+        return JsonResponse({'users': [], 'groups': []})
+
+    return JsonResponse(typeahead.search(prefix))
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None, files=request.FILES or None)
@@ -68,6 +156,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        pregenerate(post.image, post.pk)
 
         return redirect('posts:profile', post.author)
 
@@ -87,6 +176,8 @@ def post_edit(request, post_id):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if 'image' in form.changed_data:
+            pregenerate(post.image, post.pk)
 
         return redirect('posts:post_detail', post_id=post.pk)
 
@@ -100,6 +191,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -114,33 +206,89 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, post_list)
+    post_list = Post.objects.for_feed().filter(
+        timeline__user=request.user).annotate(
+        feed_date=F('timeline__pub_date'), feed_post=F('timeline__post'))
+    page_obj = paginator(
+        request, post_list, keyset=True, ordering=FOLLOW_CURSOR_ORDERING,
+        plain=True)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
     }
 
     return render(request, 'posts/follow.html', context)
 
 
+def _follow(user, author):
+    if user != author:
+        Follow.objects.get_or_create(user=user, author=author)
+
+
+def _unfollow(user, author):
+    Follow.objects.filter(user=user, author=author).delete()
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    if request.user.username != username:
-        author = get_object_or_404(User, username=username)
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+    _follow(request.user, get_object_or_404(User, username=username))
 
     return redirect('posts:follow_index')
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).delete()
+    _unfollow(request.user, get_object_or_404(User, username=username))
 
     return redirect('posts:follow_index')
+
+
+@require_http_methods(['POST', 'DELETE'])
+@transaction.atomic
+def follow_state(request, username):
+    """Подписка (POST) или отписка (DELETE) без перехода на ленту.
+
+    Обе операции идемпотентны; в ответе — новое состояние подписки
+    и счётчики автора.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    author = get_object_or_404(User, username=username)
+    if author == request.user:
+        return JsonResponse(
+            {'error': 'Нельзя подписаться на себя'}, status=400)
+    if request.method == 'POST':
+        _follow(request.user, author)
+    else:
+        _unfollow(request.user, author)
+    followers_count, following_count = Profile.objects.filter(
+        user=author).values_list(
+        'followers_count', 'following_count').get()
+
+    return JsonResponse({
+        'following': request.method == 'POST',
+        'followers_count': followers_count,
+        'following_count': following_count,
+    })
+
+
+@login_required
+def export_data(request):
+    export_format = request.GET.get('format')
+    if export_format not in export.FORMATS:
+        export_format = export.FORMATS[0]
+    with_images = bool(request.GET.get('images'))
+    if with_images:
+        content = export.zip_chunks(
+            request.user, export_format, default_storage)
+        content_type = export.CONTENT_TYPES['zip']
+    else:
+        content = export.lines(request.user, export_format)
+        content_type = export.CONTENT_TYPES[export_format]
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        export.filename(request.user, export_format, with_images))
+
+    return response
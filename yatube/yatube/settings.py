@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -29,6 +30,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,9 +68,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:{}?mode=ro'.format(os.path.join(BASE_DIR, 'db.sqlite3')),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+DATABASE_ROUTERS = ['core.routing.PrimaryReplicaRouter']
+TEST_RUNNER = 'core.runner.PrimaryOnlyRunner'
+
+READ_REPLICA_ALIAS = 'replica'
+# False — всё читается из основной базы. Так в тестах: там реплика —
+# зеркало основной базы и не видит незакоммиченных данных теста.
+READ_REPLICA_ENABLED = True
+# Из реплики читают только публичные страницы и только модели, для
+# которых отставание реплики безвредно; сессии и ленты подписок —
+# всегда из основной базы.
+READ_REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:search',
+    'posts:trending',
+)
+READ_REPLICA_MODELS = (
+    'posts.post',
+    'posts.group',
+    'posts.comment',
+    'posts.profile',
+    'posts.suggestion',
+    'posts.trendingpost',
+    'posts.trendinggroup',
+)
+READ_REPLICA_PIN_COOKIE = 'primary_pin'
+READ_REPLICA_PIN_SECONDS = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -109,8 +160,27 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш у каждого процесса свой, сбросы между процессами не расходятся;
+# отставание ограничено сроками FEED_CACHE_TIMEOUT и PAGE_CACHE_TIMEOUT.
+# При нескольких процессах лучше общий бэкенд (Memcached, Redis).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.timing.TimedLocMemCache',
     }
 }
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# 0 — миниатюры создаются сразу после коммита, без фонового пула.
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_KVSTORE = 'posts.thumbnails.LRUKVStore'
+THUMBNAIL_LRU_SIZE = 1000
+
+# Потоки пересчёта подсказок «на кого подписаться»; 0 — сразу после
+# коммита в том же потоке.
+SUGGESTION_WORKERS = 1
+
+# Журнал медленных запросов: None — выключен, иначе порог в миллисекундах.
+SLOW_QUERY_THRESHOLD_MS = None
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 5
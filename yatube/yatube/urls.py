@@ -3,13 +3,18 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import include, path
 
+from core.views import event_stats, latency_stats
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
     path('admin/', admin.site.urls),
+    path('metrics/latency/', latency_stats, name='latency_stats'),
+    path('metrics/events/', event_stats, name='event_stats'),
 ]
 
 handler404 = 'core.views.page_not_found'